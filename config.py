@@ -10,5 +10,75 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///study_rpg.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "uploads")
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
+    # Uploads are streamed to disk and extracted page by page, so large scanned textbooks are fine
+    MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", 200 * 1024 * 1024))  # 200MB max upload size
     GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+    # The ONLY model we are using. Do not switch to a different one.
+    GEMINI_MODEL = 'models/gemini-2.5-flash-preview-04-17'
+    # AI backend: 'gemini', or 'fake' for offline load testing
+    AI_BACKEND = os.environ.get("AI_BACKEND", "gemini")
+    AI_FAKE_LATENCY = float(os.environ.get("AI_FAKE_LATENCY", 0.0))  # seconds per call
+    AI_FAKE_ERROR_RATE = float(os.environ.get("AI_FAKE_ERROR_RATE", 0.0))
+    AI_FAKE_MALFORMED_RATE = float(os.environ.get("AI_FAKE_MALFORMED_RATE", 0.0))
+    AI_FAKE_SEED = int(os.environ.get("AI_FAKE_SEED", 0))
+    AI_FAKE_QUOTA_RPS = int(os.environ.get("AI_FAKE_QUOTA_RPS", 0))  # 0 = no simulated quota
+    # AI request limits shared by all threads of a process: requests per minute (0 = no limit)
+    # with bursts of up to AI_RATE_LIMIT_BURST, and calls in flight at once
+    AI_RATE_LIMIT_RPM = int(os.environ.get("AI_RATE_LIMIT_RPM", 60))
+    AI_RATE_LIMIT_BURST = int(os.environ.get("AI_RATE_LIMIT_BURST", 5))
+    AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", 8))
+    # Retries of quota, timeout and server errors, with exponential backoff and jitter (seconds)
+    AI_MAX_RETRIES = int(os.environ.get("AI_MAX_RETRIES", 4))
+    AI_RETRY_BASE_DELAY = float(os.environ.get("AI_RETRY_BASE_DELAY", 1.0))
+    AI_RETRY_MAX_DELAY = float(os.environ.get("AI_RETRY_MAX_DELAY", 30.0))
+    # Consecutive failures that stop AI calls, and seconds before trying again
+    AI_CIRCUIT_FAILURES = int(os.environ.get("AI_CIRCUIT_FAILURES", 5))
+    AI_CIRCUIT_RESET = float(os.environ.get("AI_CIRCUIT_RESET", 60.0))
+    # Background ingestion: worker threads per process (0 runs jobs inline)
+    INGESTION_WORKERS = int(os.environ.get("INGESTION_WORKERS", 2))
+    # Seconds without progress before a 'running' job is considered abandoned
+    INGESTION_STALE_SECONDS = int(os.environ.get("INGESTION_STALE_SECONDS", 600))
+    # PDF extraction: worker processes for large documents (1 disables parallelism)
+    PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", min(4, os.cpu_count() or 1)))
+    PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 50))
+    # Pages per parallel extraction task; at most two tasks per worker are in flight
+    PDF_PAGE_BATCH = int(os.environ.get("PDF_PAGE_BATCH", 32))
+    # Question generation: estimated tokens of document text per request (far below the
+    # model's input limit, so questions stay focused), tokens repeated between neighbouring
+    # chunks and concurrent Gemini calls per document
+    QUESTION_CHUNK_TOKENS = int(os.environ.get("QUESTION_CHUNK_TOKENS", 2000))
+    QUESTION_CHUNK_OVERLAP_TOKENS = int(os.environ.get("QUESTION_CHUNK_OVERLAP_TOKENS", 100))
+    GENERATION_CONCURRENCY = int(os.environ.get("GENERATION_CONCURRENCY", 4))
+    # Streamed questions are committed in batches of this many, or once the oldest has
+    # waited this many seconds when the next one arrives
+    QUESTION_SAVE_BATCH = int(os.environ.get("QUESTION_SAVE_BATCH", 5))
+    QUESTION_SAVE_INTERVAL = float(os.environ.get("QUESTION_SAVE_INTERVAL", 1.0))
+    # Seconds between database polls of a /jobs/<id>/events stream, and the longest a
+    # stream stays open (the browser then reconnects and resumes from Last-Event-ID)
+    JOB_EVENTS_POLL_INTERVAL = float(os.environ.get("JOB_EVENTS_POLL_INTERVAL", 0.25))
+    JOB_EVENTS_MAX_SECONDS = float(os.environ.get("JOB_EVENTS_MAX_SECONDS", 120))
+    # Text similarity (0-1) from which a question with the same answer as an existing one is a near-duplicate
+    DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", 0.5))
+    # AI response cache (SQLite file in the instance folder)
+    AI_CACHE_ENABLED = os.environ.get("AI_CACHE_ENABLED", "true").lower() == "true"
+    AI_CACHE_MAX_BYTES = int(os.environ.get("AI_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    AI_CACHE_TTL = int(os.environ.get("AI_CACHE_TTL", 30 * 24 * 3600))  # seconds
+    # Opt-in in-process cache of immutable user fields (id, username, email)
+    IDENTITY_CACHE_ENABLED = os.environ.get("IDENTITY_CACHE_ENABLED", "false").lower() == "true"
+    IDENTITY_CACHE_TTL = int(os.environ.get("IDENTITY_CACHE_TTL", 300))  # seconds
+    IDENTITY_CACHE_SIZE = int(os.environ.get("IDENTITY_CACHE_SIZE", 1024))
+    # Largest number of answers accepted by one POST /answers/batch
+    ANSWER_BATCH_MAX_SIZE = int(os.environ.get("ANSWER_BATCH_MAX_SIZE", 50))
+    # How many of a user's latest answers on a topic drive adaptive difficulty
+    ADAPTIVE_WINDOW = int(os.environ.get("ADAPTIVE_WINDOW", 20))
+    # Most questions one upload or regeneration may ask the model for (form values are clamped)
+    MAX_QUESTIONS_PER_JOB = int(os.environ.get("MAX_QUESTIONS_PER_JOB", 20))
+    # Questions per training session, each fetched from /training/<id>/next after the last answer
+    TRAINING_SESSION_SIZE = int(os.environ.get("TRAINING_SESSION_SIZE", 10))
+    # Questions per spaced-repetition review session
+    REVIEW_SESSION_SIZE = int(os.environ.get("REVIEW_SESSION_SIZE", 20))
+    # Questions per battle, and how many recent answers on the topic to avoid repeating
+    BATTLE_QUESTION_COUNT = int(os.environ.get("BATTLE_QUESTION_COUNT", 5))
+    BATTLE_RECENT_WINDOW = int(os.environ.get("BATTLE_RECENT_WINDOW", 20))
+    # Results per page of full-text search
+    SEARCH_PAGE_SIZE = int(os.environ.get("SEARCH_PAGE_SIZE", 20))
@@ -0,0 +1,85 @@
+"""Move Document.content into a compressed document_content table
+
+Revision ID: 0b6d3f9a8c24
+Revises: f2a8c5d3e7b1
+Create Date: 2026-10-18 15:10:48.114902
+
+"""
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6d3f9a8c24'
+down_revision = 'f2a8c5d3e7b1'
+branch_labels = None
+depends_on = None
+
+PREVIEW_LENGTH = 200
+BATCH = 200
+
+document = sa.table(
+    'document',
+    sa.column('id', sa.Integer),
+    sa.column('content', sa.Text),
+    sa.column('preview', sa.String),
+)
+document_content = sa.table(
+    'document_content',
+    sa.column('document_id', sa.Integer),
+    sa.column('data', sa.LargeBinary),
+    sa.column('size', sa.Integer),
+)
+
+
+def upgrade():
+    op.create_table(
+        'document_content',
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['document_id'], ['document.id']),
+        sa.PrimaryKeyConstraint('document_id'),
+        if_not_exists=True
+    )
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('preview', sa.String(length=PREVIEW_LENGTH), nullable=True))
+
+    # Compress existing text in batches so large libraries are not loaded at once
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(document.c.id, document.c.content)
+            .where(document.c.id > last_id, document.c.content.isnot(None))
+            .order_by(document.c.id)
+            .limit(BATCH)
+        ).all()
+        if not rows:
+            break
+        for doc_id, content in rows:
+            raw = content.encode('utf-8')
+            conn.execute(document_content.insert().values(
+                document_id=doc_id, data=zlib.compress(raw, 6), size=len(raw)))
+            conn.execute(document.update().where(document.c.id == doc_id).values(
+                preview=' '.join(content[:PREVIEW_LENGTH * 2].split())[:PREVIEW_LENGTH]))
+        last_id = rows[-1][0]
+
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_column('content')
+
+
+def downgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content', sa.Text(), nullable=True))
+
+    conn = op.get_bind()
+    for doc_id, data in conn.execute(sa.select(document_content.c.document_id, document_content.c.data)).all():
+        conn.execute(document.update().where(document.c.id == doc_id).values(
+            content=zlib.decompress(data).decode('utf-8')))
+
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_column('preview')
+    op.drop_table('document_content')
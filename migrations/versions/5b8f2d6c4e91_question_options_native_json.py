@@ -0,0 +1,44 @@
+"""Store Question.options as native JSON (JSONB on PostgreSQL)
+
+Revision ID: 5b8f2d6c4e91
+Revises: a3c9e1f0b7d2
+Create Date: 2026-10-18 10:03:17.552904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8f2d6c4e91'
+down_revision = 'a3c9e1f0b7d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.alter_column('question', 'options',
+                        existing_type=sa.Text(),
+                        type_=postgresql.JSONB(),
+                        postgresql_using='options::jsonb')
+    else:
+        if bind.dialect.name == 'sqlite':
+            # Unparseable legacy values would fail on load once the column is JSON
+            op.execute("UPDATE question SET options = NULL WHERE options IS NOT NULL AND json_valid(options) = 0")
+        with op.batch_alter_table('question', schema=None) as batch_op:
+            batch_op.alter_column('options', existing_type=sa.Text(), type_=sa.JSON())
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.alter_column('question', 'options',
+                        existing_type=postgresql.JSONB(),
+                        type_=sa.Text(),
+                        postgresql_using='options::text')
+    else:
+        with op.batch_alter_table('question', schema=None) as batch_op:
+            batch_op.alter_column('options', existing_type=sa.JSON(), type_=sa.Text())
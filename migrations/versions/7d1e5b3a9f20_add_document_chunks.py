@@ -0,0 +1,50 @@
+"""Add document_chunk and ingestion_job.kind
+
+Revision ID: 7d1e5b3a9f20
+Revises: 0b6d3f9a8c24
+Create Date: 2026-10-18 16:02:31.540217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d1e5b3a9f20'
+down_revision = '0b6d3f9a8c24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing documents are split into chunks by `flask search rebuild`, or the first
+    # time they are regenerated
+    op.create_table(
+        'document_chunk',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('question_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['document_id'], ['document.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('document_id', 'position', name='uq_document_chunk_document_id_position'),
+        if_not_exists=True
+    )
+    op.create_index('ix_document_chunk_document_id_question_count', 'document_chunk',
+                    ['document_id', 'question_count'], unique=False, if_not_exists=True)
+
+    # ingestion_job is created by db.create_all(), which may already include the column
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('ingestion_job') and 'kind' not in {
+            column['name'] for column in inspector.get_columns('ingestion_job')}:
+        with op.batch_alter_table('ingestion_job', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('kind', sa.String(length=20), nullable=False, server_default='upload'))
+
+
+def downgrade():
+    with op.batch_alter_table('ingestion_job', schema=None) as batch_op:
+        batch_op.drop_column('kind')
+
+    op.drop_index('ix_document_chunk_document_id_question_count', table_name='document_chunk')
+    op.drop_table('document_chunk')
@@ -0,0 +1,51 @@
+"""Add question_signature and question_bucket for near-duplicate detection
+
+Revision ID: 9c4f1a7e2d53
+Revises: 7d1e5b3a9f20
+Create Date: 2026-10-18 17:21:09.318840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4f1a7e2d53'
+down_revision = '7d1e5b3a9f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing questions are indexed by `flask questions dedupe`
+    op.create_table(
+        'question_signature',
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('topic_id', sa.Integer(), nullable=False),
+        sa.Column('minhash', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['question_id'], ['question.id']),
+        sa.ForeignKeyConstraint(['topic_id'], ['topic.id']),
+        sa.PrimaryKeyConstraint('question_id'),
+        if_not_exists=True
+    )
+    op.create_index('ix_question_signature_topic_id', 'question_signature', ['topic_id'],
+                    unique=False, if_not_exists=True)
+    op.create_table(
+        'question_bucket',
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column('topic_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['question_id'], ['question.id']),
+        sa.ForeignKeyConstraint(['topic_id'], ['topic.id']),
+        sa.PrimaryKeyConstraint('question_id', 'bucket'),
+        if_not_exists=True
+    )
+    op.create_index('ix_question_bucket_topic_id_bucket', 'question_bucket', ['topic_id', 'bucket'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_question_bucket_topic_id_bucket', table_name='question_bucket')
+    op.drop_table('question_bucket')
+    op.drop_index('ix_question_signature_topic_id', table_name='question_signature')
+    op.drop_table('question_signature')
@@ -0,0 +1,38 @@
+"""Add content_hash to Document and document_id to Question
+
+Revision ID: a3c9e1f0b7d2
+Revises: d35f2054d929
+Create Date: 2026-10-18 09:12:44.201377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e1f0b7d2'
+down_revision = 'd35f2054d929'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_document_content_hash'), ['content_hash'], unique=False)
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('document_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_question_document_id'), ['document_id'], unique=False)
+        batch_op.create_foreign_key('fk_question_document_id_document', 'document', ['document_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_question_document_id_document', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_question_document_id'))
+        batch_op.drop_column('document_id')
+
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_document_content_hash'))
+        batch_op.drop_column('content_hash')
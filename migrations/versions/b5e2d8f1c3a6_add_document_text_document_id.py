@@ -0,0 +1,40 @@
+"""Add document.text_document_id for identical uploads sharing text and chunks
+
+Revision ID: b5e2d8f1c3a6
+Revises: 9c4f1a7e2d53
+Create Date: 2026-10-18 19:04:52.611284
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e2d8f1c3a6'
+down_revision = '9c4f1a7e2d53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Documents copied before this revision keep their own body and chunks
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('text_document_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_document_text_document_id'), ['text_document_id'], unique=False)
+        batch_op.create_foreign_key('fk_document_text_document_id_document', 'document',
+                                    ['text_document_id'], ['id'])
+
+
+def downgrade():
+    # Give documents sharing another document's text their own copy again
+    op.execute("""
+        INSERT INTO document_content (document_id, data, size)
+        SELECT d.id, c.data, c.size FROM document d JOIN document_content c ON c.document_id = d.text_document_id""")
+    op.execute("""
+        INSERT INTO document_chunk (document_id, position, text, question_count)
+        SELECT d.id, c.position, c.text, c.question_count
+        FROM document d JOIN document_chunk c ON c.document_id = d.text_document_id""")
+    with op.batch_alter_table('document', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_document_text_document_id_document', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_document_text_document_id'))
+        batch_op.drop_column('text_document_id')
@@ -0,0 +1,38 @@
+"""Add indexes for hot foreign-key and filter columns
+
+Revision ID: c71e4a9d2b38
+Revises: 5b8f2d6c4e91
+Create Date: 2026-10-18 10:41:52.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71e4a9d2b38'
+down_revision = '5b8f2d6c4e91'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_topic_user_id', 'topic', ['user_id']),
+    ('ix_document_topic_id', 'document', ['topic_id']),
+    ('ix_question_topic_id_difficulty', 'question', ['topic_id', 'difficulty']),
+    ('ix_user_response_user_id_created_at', 'user_response', ['user_id', 'created_at']),
+    ('ix_user_response_question_id', 'user_response', ['question_id']),
+    ('ix_battle_user_id_started_at', 'battle', ['user_id', 'started_at']),
+    ('ix_battle_topic_id', 'battle', ['topic_id']),
+    ('ix_quest_user_id_completed_quest_type', 'quest', ['user_id', 'completed', 'quest_type']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,39 @@
+"""Add topic_id to UserResponse for adaptive training
+
+Revision ID: e4b7a2c9d1f6
+Revises: c71e4a9d2b38
+Create Date: 2026-10-18 13:05:27.518640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7a2c9d1f6'
+down_revision = 'c71e4a9d2b38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_response', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('topic_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_user_response_topic_id_topic', 'topic', ['topic_id'], ['id'])
+
+    # Backfill from each response's question
+    op.execute(
+        "UPDATE user_response SET topic_id = "
+        "(SELECT question.topic_id FROM question WHERE question.id = user_response.question_id)"
+    )
+
+    with op.batch_alter_table('user_response', schema=None) as batch_op:
+        batch_op.create_index('ix_user_response_user_id_topic_id_created_at',
+                              ['user_id', 'topic_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_response', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_response_user_id_topic_id_created_at')
+        batch_op.drop_constraint('fk_user_response_topic_id_topic', type_='foreignkey')
+        batch_op.drop_column('topic_id')
@@ -0,0 +1,37 @@
+"""Add random_key to Question for battle sampling
+
+Revision ID: f2a8c5d3e7b1
+Revises: e4b7a2c9d1f6
+Create Date: 2026-10-18 14:22:09.730415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8c5d3e7b1'
+down_revision = 'e4b7a2c9d1f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('random_key', sa.Float(), nullable=True))
+
+    # Uniform keys in [0, 1); SQLite's random() is a signed 64-bit integer
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("UPDATE question SET random_key = random() / 18446744073709551616.0 + 0.5")
+    else:
+        op.execute("UPDATE question SET random_key = random()")
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.create_index('ix_question_topic_id_difficulty_random_key',
+                              ['topic_id', 'difficulty', 'random_key'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_index('ix_question_topic_id_difficulty_random_key')
+        batch_op.drop_column('random_key')
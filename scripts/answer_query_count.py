@@ -0,0 +1,77 @@
+"""Count the SQL statements issued by one POST /answer request.
+
+Usage:
+    python scripts/answer_query_count.py [--max-statements 9]
+
+Runs a correct training answer, a battle answer and a five-answer battle
+batch (POST /answers/batch) against a throwaway SQLite database, prints
+every statement and exits non-zero if any request issues more than
+``--max-statements``.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event  # noqa: E402
+
+from config import Config  # noqa: E402
+from study_app import create_app, db  # noqa: E402
+from study_app.models import Topic, Question, Quest  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-statements', type=int, default=9)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class CountConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'count.db')}"
+            UPLOAD_FOLDER = os.path.join(tmp, 'uploads')
+            AI_CACHE_ENABLED = False
+
+        app = create_app(CountConfig)
+        client = app.test_client()
+        client.get('/')  # Warm up one-off per-process work (e.g. resuming ingestion jobs)
+        with app.app_context():
+            topic = Topic(title='Count', user_id=1)
+            db.session.add(topic)
+            db.session.flush()
+            questions = [Question(content=f'Q{i}?', options_list=['a', 'b'], answer='a', topic_id=topic.id)
+                         for i in range(5)]
+            db.session.add_all(questions)
+            db.session.add_all([Quest(user_id=1, title='Train', quest_type='training', target=1),
+                                Quest(user_id=1, title='Fight', quest_type='battle', target=1)])
+            db.session.commit()
+            topic_id, question_ids = topic.id, [q.id for q in questions]
+
+            statements = []
+
+            @event.listens_for(db.engine, 'before_cursor_execute')
+            def record(conn, cursor, statement, parameters, context, executemany):
+                statements.append(' '.join(statement.split()))
+
+        failed = False
+        batch = {'answers': [{'question_id': qid, 'answer': 'a' if i % 2 else 'b', 'response_time': 3}
+                             for i, qid in enumerate(question_ids)]}
+        single = {'question_id': question_ids[0], 'answer': 'a', 'response_time': 3}
+        for label, prepare, url, payload in (('training answer', None, '/answer', single),
+                                             ('battle answer', f'/battle/{topic_id}', '/answer', single),
+                                             ('battle batch', f'/battle/{topic_id}', '/answers/batch', batch)):
+            if prepare:
+                client.get(prepare)
+            statements.clear()
+            response = client.post(url, json=payload)
+            print(f"{label} -> {response.status_code} {response.get_json()}")
+            for statement in statements:
+                print(f"    {statement[:110]}")
+            print(f"    {len(statements)} statements\n")
+            failed |= len(statements) > args.max_statements
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
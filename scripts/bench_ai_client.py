@@ -0,0 +1,74 @@
+"""Measure AI request throughput against a quota-limited fake backend.
+
+Usage:
+    python scripts/bench_ai_client.py [--calls 300] [--threads 16] [--quota 20]
+                                      [--latency 0.05] [--error-rate 0.02]
+
+``--threads`` threads share one ``RateLimitedBackend`` around a
+``FakeBackend`` that rejects calls beyond ``--quota`` per second with a 429
+and fails ``--error-rate`` of the rest. Three setups are compared:
+
+* no-limits: no rate limit and no retries, so every error is a lost request
+* retry-only: backoff with jitter, but calls are not paced to the quota
+* limited: token bucket at the quota plus retries (the app's setup)
+
+For each it prints successful requests per second, lost requests and how
+many backend calls were made.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from study_app.ai_backends import FakeBackend, RateLimitedBackend  # noqa: E402
+
+
+class CountingBackend(FakeBackend):
+    attempts = 0
+
+    def generate(self, prompt):
+        self.attempts += 1
+        return super().generate(prompt)
+
+
+def run(args, requests_per_minute, max_retries):
+    fake = CountingBackend(latency=args.latency, error_rate=args.error_rate, quota_rps=args.quota)
+    backend = RateLimitedBackend(fake, requests_per_minute=requests_per_minute, burst=max(1, args.quota // 4),
+                                 max_concurrency=args.threads, max_retries=max_retries,
+                                 base_delay=0.1, max_delay=2.0, failure_threshold=args.calls, reset_timeout=1.0)
+
+    def call(i):
+        try:
+            backend.generate(f"generate 1 multiple-choice Study Content: Sentence number {i} is here.")
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        succeeded = sum(executor.map(call, range(args.calls)))
+    elapsed = time.perf_counter() - start
+    return succeeded, elapsed, fake.attempts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--quota', type=int, default=20, help="Fake backend quota (requests per second)")
+    parser.add_argument('--latency', type=float, default=0.05, help="Fake backend latency per call (s)")
+    parser.add_argument('--error-rate', type=float, default=0.02, help="Fraction of calls failing transiently")
+    args = parser.parse_args()
+
+    print(f"{args.calls} requests from {args.threads} threads, quota {args.quota}/s")
+    for name, rpm, retries in (('no-limits', 0, 0), ('retry-only', 0, 6), ('limited', args.quota * 60, 6)):
+        succeeded, elapsed, attempts = run(args, rpm, retries)
+        print(f"{name:<11} {succeeded / elapsed:6.1f} ok/s  lost {args.calls - succeeded:4d}  "
+              f"backend calls {attempts:4d}  {elapsed:6.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Compare per-object ORM inserts with the bulk question/quest insert path.
+
+Usage:
+    python scripts/bench_bulk_insert.py [--questions 500] [--repeat 5]
+
+The "orm" path mirrors the original upload flow: one Question object added
+per question, a commit, then two Quest objects and another commit. The "bulk"
+path uses persistence.save_question_batch (one transaction).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config  # noqa: E402
+from study_app import create_app, db  # noqa: E402
+from study_app.models import Topic, Question, Quest  # noqa: E402
+from study_app.persistence import question_row, default_quest_rows, save_question_batch  # noqa: E402
+
+
+def sample_questions(n):
+    return [{
+        "question": f"Sample question number {i}?",
+        "options": [f"Option {i}-{j}" for j in range(4)],
+        "answer": f"Option {i}-0",
+        "explanation": "Because the text says so.",
+        "difficulty": i % 5 + 1,
+    } for i in range(n)]
+
+
+def orm_path(questions_data, topic):
+    for q_data in questions_data:
+        db.session.add(Question(
+            content=q_data['question'],
+            options_list=q_data['options'],
+            answer=q_data['answer'],
+            explanation=q_data['explanation'],
+            difficulty=q_data['difficulty'],
+            topic_id=topic.id
+        ))
+    db.session.commit()
+    db.session.add_all([Quest(**row) for row in default_quest_rows(topic.user_id, topic.title)])
+    db.session.commit()
+
+
+def bulk_path(questions_data, topic):
+    rows = [question_row(q_data, topic.id) for q_data in questions_data]
+    save_question_batch(rows, default_quest_rows(topic.user_id, topic.title))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            UPLOAD_FOLDER = os.path.join(tmp, 'uploads')
+            AI_CACHE_ENABLED = False
+
+        app = create_app(BenchConfig)
+        questions_data = sample_questions(args.questions)
+        with app.app_context():
+            topic = Topic(title='Bench', user_id=1)
+            db.session.add(topic)
+            db.session.commit()
+            topic_id = topic.id
+
+            for name, path in (('orm', orm_path), ('bulk', bulk_path)):
+                best = float('inf')
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    path(questions_data, topic)
+                    best = min(best, time.perf_counter() - start)
+                    db.session.expunge_all()
+                    topic = db.session.get(Topic, topic_id)
+                print(f"{name:<5} {args.questions} questions + 2 quests: {best * 1000:8.1f} ms "
+                      f"({args.questions / best:,.0f} questions/s)")
+
+
+if __name__ == '__main__':
+    main()
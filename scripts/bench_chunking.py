@@ -0,0 +1,102 @@
+"""Measure text cleaning and chunking throughput in MB/s.
+
+Usage:
+    python scripts/bench_chunking.py [--mb 20] [--tokens 2000] [--overlap 100]
+
+Builds synthetic page texts shaped like PyPDF2 output (hard line wraps,
+blank lines between paragraphs, runs of spaces, numbers and the odd
+ligature) and times, per MB of raw text:
+
+* legacy: the previous whole-string ``re.sub`` + ``replace`` cleaning and
+  character-count chunking, kept here for comparison
+* clean: ``iter_clean_text`` over the pages
+* chunk: ``iter_chunks(iter_clean_text(pages))`` without and with overlap
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from study_app.pdf_processor import iter_clean_text, iter_chunks, CHARS_PER_TOKEN  # noqa: E402
+
+WORDS = ("the cell membrane controls what enters and leaves while mitochondria produce "
+         "energy in 1998 about 12.5 percent of ﬁrst samples showed | no effect").split()
+
+
+def synthetic_pages(megabytes, seed=0):
+    rng = random.Random(seed)
+    pages, size = [], 0
+    while size < megabytes * 1_000_000:
+        paragraphs = []
+        for _ in range(rng.randint(3, 8)):
+            sentences = [" ".join(rng.choices(WORDS, k=rng.randint(6, 25))).capitalize() + "."
+                         for _ in range(rng.randint(2, 7))]
+            text = " ".join(sentences)
+            # Hard-wrap at ~80 columns with ragged spacing, like extracted PDF lines
+            lines = [text[i:i + 80] for i in range(0, len(text), 80)]
+            paragraphs.append(" \n".join(lines).replace(". ", ".  "))
+        page = "\n\n".join(paragraphs)
+        pages.append(page)
+        size += len(page.encode('utf-8'))
+    return pages, size
+
+
+def legacy(pages, chunk_chars):
+    text = re.sub(r'\s+', ' ', "".join(page + "\n\n" for page in pages))
+    text = text.replace('|', 'I').replace('1', 'l')
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            sentence_end = text.rfind('.', start, end)
+            if sentence_end > start + chunk_chars // 2:
+                end = sentence_end + 1
+        chunks.append(text[start:end])
+        start = end
+    return len(chunks)
+
+
+def clean(pages):
+    return sum(1 for _ in iter_clean_text(pages))
+
+
+def chunk(pages, tokens, overlap):
+    return sum(1 for _ in iter_chunks(iter_clean_text(pages), tokens, overlap))
+
+
+def measure(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mb', type=float, default=20, help="Megabytes of raw page text")
+    parser.add_argument('--tokens', type=int, default=2000, help="Token budget per chunk")
+    parser.add_argument('--overlap', type=int, default=100, help="Overlap tokens for the last run")
+    args = parser.parse_args()
+
+    pages, size = synthetic_pages(args.mb)
+    print(f"{len(pages)} pages, {size / 1e6:.1f} MB of raw text")
+    runs = (
+        ('legacy', legacy, (pages, args.tokens * CHARS_PER_TOKEN), 'chunks'),
+        ('clean', clean, (pages,), 'pages'),
+        ('chunk', chunk, (pages, args.tokens, 0), 'chunks'),
+        (f'chunk+{args.overlap}', chunk, (pages, args.tokens, args.overlap), 'chunks'),
+    )
+    for name, fn, fn_args, unit in runs:
+        count, elapsed = measure(fn, *fn_args)
+        print(f"{name:<10} {size / 1e6 / elapsed:7.1f} MB/s  {elapsed:6.2f}s  ({count} {unit})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Measure end-to-end ingestion throughput against the offline fake AI backend.
+
+Usage:
+    python scripts/bench_ingestion.py [--docs 20] [--pages 40] [--latency 0.5]
+                                      [--error-rate 0.0] [--malformed-rate 0.0]
+
+Uploads synthetic PDFs through the /upload endpoint into a throwaway SQLite
+database and waits for every ingestion job to finish. No network is needed.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config  # noqa: E402
+from study_app import create_app  # noqa: E402
+from study_app.models import IngestionJob, Question  # noqa: E402
+from bench_pdf_extract import write_synthetic_pdf  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=20, help="Number of documents to upload")
+    parser.add_argument('--pages', type=int, default=40, help="Pages per document")
+    parser.add_argument('--questions', type=int, default=10, help="Questions requested per document")
+    parser.add_argument('--latency', type=float, default=0.5, help="Fake backend latency per call (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=Config.INGESTION_WORKERS, help="Ingestion worker threads")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            UPLOAD_FOLDER = os.path.join(tmp, 'uploads')
+            AI_BACKEND = 'fake'
+            AI_CACHE_ENABLED = False
+            AI_RATE_LIMIT_RPM = 0  # measure the pipeline, not the request quota
+            AI_FAKE_LATENCY = args.latency
+            AI_FAKE_ERROR_RATE = args.error_rate
+            AI_FAKE_MALFORMED_RATE = args.malformed_rate
+            INGESTION_WORKERS = args.workers
+
+        app = create_app(BenchConfig)
+        client = app.test_client()
+
+        pdfs = []
+        for i in range(args.docs):
+            # Vary the page count so every upload has a distinct content hash
+            path = os.path.join(tmp, f'doc{i}.pdf')
+            write_synthetic_pdf(path, args.pages + i)
+            pdfs.append(path)
+
+        start = time.perf_counter()
+        job_urls = []
+        for i, path in enumerate(pdfs):
+            with open(path, 'rb') as f:
+                response = client.post('/upload', data={
+                    'topic_title': f'Bench {i}',
+                    'question_count': args.questions,
+                    'pdf_file': (f, os.path.basename(path)),
+                }, headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+            job_urls.append(response.get_json()['status_url'])
+        accepted = time.perf_counter() - start
+
+        pending = set(job_urls)
+        while pending:
+            for url in list(pending):
+                if client.get(url).get_json()['status'] in ('done', 'failed'):
+                    pending.discard(url)
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+        with app.app_context():
+            done = IngestionJob.query.filter_by(status='done').count()
+            failed = IngestionJob.query.filter_by(status='failed').count()
+            questions = Question.query.count()
+
+    print(f"uploads accepted in {accepted:.2f}s ({args.docs / accepted:.1f} req/s)")
+    print(f"{args.docs} documents ingested in {elapsed:.2f}s: {args.docs / elapsed:.2f} docs/s, "
+          f"{questions / elapsed:.1f} questions/s")
+    print(f"jobs done={done} failed={failed} questions={questions}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark serial vs. parallel PDF text extraction.
+
+Usage:
+    python scripts/bench_pdf_extract.py [path/to/file.pdf] [--pages 300] [--workers 1 2 4]
+
+Without a path, a synthetic text-only PDF with ``--pages`` pages is generated
+in a temporary directory.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from study_app.pdf_processor import extract_text_from_pdf  # noqa: E402
+
+
+def write_synthetic_pdf(path, pages, lines_per_page=45):
+    """Write a minimal multi-page PDF using the built-in Helvetica font."""
+    objects = [
+        "<</Type/Catalog/Pages 2 0 R>>",
+        "<</Type/Pages/Kids[%s]/Count %d>>" % (" ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages),
+        "<</Type/Font/Subtype/Type1/BaseFont/Helvetica>>",
+    ]
+    for i in range(pages):
+        lines = " ".join(
+            f"(Page {i} line {j}: cells convert glucose into ATP during cellular respiration.) '"
+            for j in range(lines_per_page)
+        )
+        stream = f"BT /F1 10 Tf 40 760 Td 12 TL {lines} ET"
+        objects.append(f"<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]"
+                       f"/Resources<</Font<</F1 3 0 R>>>>/Contents {5 + 2 * i} 0 R>>")
+        objects.append(f"<</Length {len(stream)}>>stream\n{stream}\nendstream")
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{num} 0 obj{body}endobj\n"
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer<</Size {len(objects) + 1}/Root 1 0 R>>\nstartxref\n{xref_offset}\n%%EOF\n"
+    with open(path, 'w', encoding='latin-1') as f:
+        f.write(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', nargs='?', help="PDF to extract (default: synthetic document)")
+    parser.add_argument('--pages', type=int, default=300, help="Pages in the synthetic document")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per worker count (best is reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if not pdf_path:
+            pdf_path = os.path.join(tmp, 'synthetic.pdf')
+            write_synthetic_pdf(pdf_path, args.pages)
+
+        import PyPDF2
+        with open(pdf_path, 'rb') as f:
+            num_pages = len(PyPDF2.PdfReader(f).pages)
+        print(f"{pdf_path}: {num_pages} pages")
+
+        baseline = None
+        for workers in args.workers:
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                text = extract_text_from_pdf(pdf_path, workers=workers)
+                best = min(best, time.perf_counter() - start)
+            baseline = baseline or best
+            print(f"workers={workers:<3} {best:7.3f}s  {num_pages / best:8.1f} pages/s  "
+                  f"speedup x{baseline / best:.2f}  ({len(text)} chars)")
+
+
+if __name__ == '__main__':
+    main()
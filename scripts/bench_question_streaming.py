@@ -0,0 +1,101 @@
+"""Measure time to first question with and without streamed generation.
+
+Usage:
+    python scripts/bench_question_streaming.py [--questions 10] [--latency 5.0]
+
+Uses the offline fake backend, whose streamed responses arrive one
+question at a time over ``--latency`` seconds. For one chunk of text it
+times:
+
+* batch: ``generate_questions``, where nothing is usable until the whole
+  response has been parsed
+* stream: ``stream_questions``, time to the first parsed question and to
+  the last
+* sse: an upload followed through ``/jobs/<id>/events``, time from the
+  upload to the first ``question`` event and to the ``done`` event
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config  # noqa: E402
+from study_app import create_app  # noqa: E402
+from study_app.ai_interface import generate_questions, stream_questions  # noqa: E402
+from bench_pdf_extract import write_synthetic_pdf  # noqa: E402
+
+CONTENT = " ".join(f"Fact number {i} says that sample {i} weighs {i * 3} grams." for i in range(200))
+
+
+def time_batch(args):
+    start = time.perf_counter()
+    generate_questions(CONTENT, num_questions=args.questions)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def time_stream(args):
+    start = time.perf_counter()
+    first = None
+    for _ in stream_questions(CONTENT, num_questions=args.questions):
+        first = first or time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def time_sse(args, app, tmp):
+    client = app.test_client()
+    path = os.path.join(tmp, 'doc.pdf')
+    write_synthetic_pdf(path, 2)
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        response = client.post('/upload', data={
+            'topic_title': 'Bench',
+            'question_count': args.questions,
+            'pdf_file': (f, 'doc.pdf'),
+        }, headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+    events = client.get(response.get_json()['events_url'], buffered=False)
+    first = None
+    for message in events.response:
+        message = message.decode('utf-8') if isinstance(message, bytes) else message
+        if 'event: question' in message:
+            first = first or time.perf_counter() - start
+        if 'event: done' in message or 'event: failed' in message:
+            break
+    events.close()
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=10, help="Questions requested")
+    parser.add_argument('--latency', type=float, default=5.0, help="Fake backend time per response (s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            UPLOAD_FOLDER = os.path.join(tmp, 'uploads')
+            AI_BACKEND = 'fake'
+            AI_CACHE_ENABLED = False
+            AI_FAKE_LATENCY = args.latency
+            AI_RATE_LIMIT_RPM = 0
+            INGESTION_WORKERS = 1
+            # One chunk, so the whole request is a single streamed response
+            QUESTION_CHUNK_TOKENS = 100000
+            DEDUP_THRESHOLD = 1.1  # keep every fake question; they are much alike
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            results = [('batch', time_batch(args)), ('stream', time_stream(args))]
+        results.append(('sse', time_sse(args, app, tmp)))
+
+    print(f"{args.questions} questions, {args.latency:.1f}s per response")
+    for name, (first, total) in results:
+        print(f"{name:<7} first question {first:6.2f}s  all {total:6.2f}s")
+
+
+if __name__ == '__main__':
+    main()
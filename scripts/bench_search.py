@@ -0,0 +1,106 @@
+"""Time full-text search over a synthetic corpus.
+
+Usage:
+    python scripts/bench_search.py [--documents 10000] [--chunks 4] [--questions 50000]
+
+Builds a throwaway SQLite database with ``--documents`` documents of
+``--chunks`` chunks each and ``--questions`` questions, all indexed by the
+FTS5 triggers as they are inserted. It then times search_questions and
+search_documents (first page and a later page, plus the count of the other
+tab) for common and rare terms.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config  # noqa: E402
+from study_app import create_app, db  # noqa: E402
+from study_app.models import Topic, Document, DocumentChunk, Question  # noqa: E402
+from study_app.search import search_questions, search_documents, count_results  # noqa: E402
+
+TOPICS = 50
+CHUNK_WORDS = 1200
+BATCH = 5000
+QUERIES = ['cell energy', 'mitochondria', 'word42 word7', 'word4999', 'word3 word9 word11', 'nothingmatches']
+
+
+def vocabulary(rng, size=5000):
+    # Zipf-like: a few very common words, a long tail of rare ones
+    words = [f'word{i}' for i in range(size)] + ['cell', 'energy', 'mitochondria', 'photosynthesis']
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return lambda n: rng.choices(words, weights, k=n)
+
+
+def populate(num_documents, chunks_per_document, num_questions):
+    rng = random.Random(0)
+    words = vocabulary(rng)
+    db.session.execute(db.insert(Topic), [{'id': t, 'title': f'Topic {t}', 'user_id': 1}
+                                          for t in range(1, TOPICS + 1)])
+    db.session.execute(db.insert(Document), [
+        {'id': d, 'filename': f'doc{d}.pdf', 'file_path': f'uploads/doc{d}.pdf', 'topic_id': d % TOPICS + 1}
+        for d in range(1, num_documents + 1)])
+    rows = []
+    for d in range(1, num_documents + 1):
+        for position in range(chunks_per_document):
+            rows.append({'document_id': d, 'position': position, 'text': ' '.join(words(CHUNK_WORDS))})
+            if len(rows) >= BATCH:
+                db.session.execute(db.insert(DocumentChunk), rows)
+                rows = []
+    if rows:
+        db.session.execute(db.insert(DocumentChunk), rows)
+    for start in range(0, num_questions, BATCH):
+        db.session.execute(db.insert(Question), [
+            {'content': f"What is {' '.join(words(12))}?", 'explanation': ' '.join(words(30)),
+             'options': ['a', 'b', 'c', 'd'], 'answer': 'a', 'topic_id': q % TOPICS + 1}
+            for q in range(start, min(start + BATCH, num_questions))])
+    db.session.commit()
+
+
+def timed(fn, *args, repeat=5, **kwargs):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=10000)
+    parser.add_argument('--chunks', type=int, default=4, help="Chunks per document")
+    parser.add_argument('--questions', type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class SearchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'search.db')}"
+            UPLOAD_FOLDER = os.path.join(tmp, 'uploads')
+            AI_CACHE_ENABLED = False
+
+        app = create_app(SearchConfig)
+        with app.app_context():
+            start = time.perf_counter()
+            populate(args.documents, args.chunks, args.questions)
+            print(f"Indexed {args.documents:,} documents ({args.documents * args.chunks:,} chunks) and "
+                  f"{args.questions:,} questions in {time.perf_counter() - start:.1f}s")
+
+            print(f"\n{'query':<20} {'tab':<10} {'matches':>8} {'page 1':>9} {'page 5':>9} {'other tab':>10}")
+            for query in QUERIES:
+                for kind, search, other in (('questions', search_questions, 'documents'),
+                                            ('documents', search_documents, 'questions')):
+                    first, first_ms = timed(search, 1, query)
+                    _, later_ms = timed(search, 1, query, page=5)
+                    _, count_ms = timed(count_results, other, 1, query)
+                    print(f"{query:<20} {kind:<10} {first.total:>8} {first_ms:>7.2f}ms {later_ms:>7.2f}ms "
+                          f"{count_ms:>8.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
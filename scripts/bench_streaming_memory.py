@@ -0,0 +1,74 @@
+"""Compare peak memory of whole-text and streaming PDF ingestion.
+
+Usage:
+    python scripts/bench_streaming_memory.py [path/to/file.pdf] [--pages 300]
+
+Measures the Python heap peak (tracemalloc) of extracting, cleaning,
+chunking and compressing a PDF:
+
+* whole-text: ``extract_text_from_pdf`` + ``clean_and_chunk_text`` + ``zlib``
+* streaming: ``stream_pdf_text`` -> ``iter_chunks`` and
+  ``DocumentContent.from_pieces``, page by page
+
+Extraction runs in-process (one worker) so all allocations are counted.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_pdf_extract import write_synthetic_pdf  # noqa: E402
+from study_app.models import DocumentContent  # noqa: E402
+from study_app.pdf_processor import (extract_text_from_pdf, clean_and_chunk_text,  # noqa: E402
+                                     stream_pdf_text, iter_chunks)
+
+
+def whole_text(pdf_path, chunk_tokens):
+    text = extract_text_from_pdf(pdf_path, workers=1)
+    chunks = clean_and_chunk_text(text, chunk_tokens)
+    zlib.compress("".join(chunks).encode('utf-8'), 6)
+    return len(chunks)
+
+
+def streaming(pdf_path, chunk_tokens):
+    num_chunks = sum(1 for _ in iter_chunks(stream_pdf_text(pdf_path, workers=1), chunk_tokens))
+    DocumentContent.from_pieces(stream_pdf_text(pdf_path, workers=1))
+    return num_chunks
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', nargs='?', help="PDF to ingest (default: synthetic document)")
+    parser.add_argument('--pages', type=int, default=300, help="Pages in the synthetic document")
+    parser.add_argument('--chunk-tokens', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if not pdf_path:
+            pdf_path = os.path.join(tmp, 'synthetic.pdf')
+            write_synthetic_pdf(pdf_path, args.pages)
+        print(f"{pdf_path}: {os.path.getsize(pdf_path) / 1e6:.1f} MB")
+
+        for name, fn in (('whole-text', whole_text), ('streaming', streaming)):
+            chunks, peak, elapsed = measure(fn, pdf_path, args.chunk_tokens)
+            print(f"{name:<11} peak {peak / 1e6:8.2f} MB  {elapsed:6.2f}s  ({chunks} chunks)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Print SQLite EXPLAIN QUERY PLAN for the hot route queries.
+
+Usage:
+    python scripts/explain_queries.py [--responses 1000000] [--compare]
+
+Builds a synthetic database (users, topics, questions, battles, quests and
+``--responses`` user responses), then explains the queries issued by
+training_mode, battle_mode, user_profile, view_topic, view_quests,
+update_quest_progress, next_training_question, review_mode and the
+near-duplicate check of question ingestion. With
+``--compare`` each plan is shown without the model indexes first, then with
+them.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config  # noqa: E402
+from study_app import create_app, db  # noqa: E402
+from study_app.game_logic import recent_answers  # noqa: E402
+from study_app.models import (User, Topic, Document, Question, UserResponse, Battle, Quest, ReviewState,  # noqa: E402
+                              QuestionSignature, QuestionBucket)
+
+USERS = 100
+TOPICS_PER_USER = 5
+QUESTIONS_PER_TOPIC = 200
+BATCH = 50000
+ADAPTIVE_WINDOW = 20
+
+
+def populate(num_responses):
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    # User 1 is the default user created at startup
+    db.session.execute(db.insert(User), [
+        {'id': u, 'username': f'user{u}', 'email': f'user{u}@example.com'} for u in range(2, USERS + 1)])
+    topic_ids = list(range(1, USERS * TOPICS_PER_USER + 1))
+    db.session.execute(db.insert(Topic), [
+        {'id': t, 'title': f'Topic {t}', 'user_id': (t - 1) // TOPICS_PER_USER + 1} for t in topic_ids])
+    db.session.execute(db.insert(Document), [
+        {'filename': f'doc{t}.pdf', 'file_path': f'uploads/doc{t}.pdf', 'topic_id': t} for t in topic_ids])
+    num_questions = len(topic_ids) * QUESTIONS_PER_TOPIC
+    db.session.execute(db.insert(Question), [
+        {'id': q, 'content': f'Question {q}?', 'options': ['a', 'b', 'c', 'd'], 'answer': 'a',
+         'difficulty': rng.randint(1, 5), 'topic_id': (q - 1) // QUESTIONS_PER_TOPIC + 1}
+        for q in range(1, num_questions + 1)])
+    db.session.execute(db.insert(Battle), [
+        {'user_id': rng.randint(1, USERS), 'topic_id': rng.choice(topic_ids),
+         'started_at': now - timedelta(minutes=i)} for i in range(20000)])
+    db.session.execute(db.insert(Quest), [
+        {'user_id': (i % USERS) + 1, 'title': f'Quest {i}', 'quest_type': rng.choice(('training', 'battle')),
+         'completed': rng.random() < 0.8} for i in range(20000)])
+    for start in range(0, num_responses, BATCH):
+        rows = []
+        for i in range(start, min(start + BATCH, num_responses)):
+            question_id = rng.randint(1, num_questions)
+            rows.append({'user_id': rng.randint(1, USERS), 'question_id': question_id,
+                         'topic_id': (question_id - 1) // QUESTIONS_PER_TOPIC + 1,
+                         'response_text': 'a', 'is_correct': rng.random() < 0.6,
+                         'response_time': rng.uniform(2, 30), 'created_at': now - timedelta(seconds=i)})
+        db.session.execute(db.insert(UserResponse), rows)
+    db.session.commit()
+
+
+def route_queries():
+    user_id, topic_id, question_id = 7, 33, 1234
+    return {
+        'training_mode: questions by difficulty':
+            Question.query.filter_by(topic_id=topic_id).order_by(Question.difficulty),
+        'battle_mode: random bucket draw':
+            db.select(Question).where(Question.topic_id == topic_id, Question.difficulty == 3)
+            .where(Question.random_key >= 0.5)
+            .where(Question.id.not_in(db.select(recent_answers(user_id, topic_id, ADAPTIVE_WINDOW).c.question_id)))
+            .order_by(Question.random_key).limit(3),
+        'user_profile: topics':
+            Topic.query.filter_by(user_id=user_id),
+        'user_profile: battles newest first':
+            Battle.query.filter_by(user_id=user_id).order_by(Battle.started_at.desc()),
+        'user_profile: recent responses':
+            UserResponse.query.filter_by(user_id=user_id).order_by(UserResponse.created_at.desc()).limit(50),
+        'view_topic: documents':
+            Document.query.filter_by(topic_id=topic_id),
+        'view_quests: quests':
+            Quest.query.filter_by(user_id=user_id),
+        'update_quest_progress: active quests':
+            Quest.query.filter_by(user_id=user_id, completed=False, quest_type='training'),
+        'question responses':
+            UserResponse.query.filter_by(question_id=question_id),
+        'next_training_question: recent window':
+            db.select(db.func.count()).select_from(recent_answers(user_id, topic_id, ADAPTIVE_WINDOW)),
+        'next_training_question: difficulty bucket':
+            db.select(Question).where(Question.topic_id == topic_id, Question.difficulty == 3)
+            .where(Question.id.not_in(db.select(recent_answers(user_id, topic_id, ADAPTIVE_WINDOW).c.question_id)))
+            .order_by(Question.id).limit(1),
+        'review_mode: due items':
+            db.select(Question).join(ReviewState, ReviewState.question_id == Question.id)
+            .where(ReviewState.user_id == user_id, ReviewState.due_at <= datetime.utcnow())
+            .order_by(ReviewState.due_at).limit(20),
+        'ingestion: near-duplicate candidates':
+            db.select(QuestionBucket.bucket, QuestionSignature.minhash)
+            .join(QuestionSignature, QuestionSignature.question_id == QuestionBucket.question_id)
+            .where(QuestionBucket.topic_id == topic_id, QuestionBucket.bucket.in_([-3, 5, 8])),
+    }
+
+
+def explain_all():
+    for name, query in route_queries().items():
+        statement = getattr(query, 'statement', query)
+        sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plan = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        start = time.perf_counter()
+        db.session.execute(statement).all()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"\n{name}  ({elapsed:.2f} ms)")
+        for row in plan:
+            print(f"    {row[-1]}")
+
+
+def model_indexes():
+    return [index for table in db.metadata.sorted_tables for index in table.indexes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--responses', type=int, default=1000000)
+    parser.add_argument('--compare', action='store_true', help="Also show plans without the indexes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class ExplainConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'explain.db')}"
+            UPLOAD_FOLDER = os.path.join(tmp, 'uploads')
+            AI_CACHE_ENABLED = False
+
+        app = create_app(ExplainConfig)
+        with app.app_context():
+            start = time.perf_counter()
+            populate(args.responses)
+            print(f"Populated {args.responses:,} responses in {time.perf_counter() - start:.1f}s")
+
+            if args.compare:
+                for index in model_indexes():
+                    index.drop(db.engine)
+                db.session.execute(db.text("ANALYZE"))
+                print("\n=== Without indexes ===")
+                explain_all()
+                for index in model_indexes():
+                    index.create(db.engine)
+
+            db.session.execute(db.text("ANALYZE"))
+            print("\n=== With indexes ===")
+            explain_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -32,6 +32,77 @@ function notifyQuestCompletion(titles) {
     });
 }
 
+// Queues answers and posts them to /answers/batch in one request.
+// A batch is sent when flush() is called (e.g. at the end of a round), when
+// flushDelay ms have passed since the first queued answer, or when the page
+// is hidden. enqueue() returns a promise for that answer's result, merged
+// with the batch-wide fields (battle_status, leveled_up, quests_completed...).
+class AnswerQueue {
+    constructor(url, flushDelay = 1500) {
+        this.url = url;
+        this.flushDelay = flushDelay;
+        this.pending = [];
+        this.flushTimer = null;
+        window.addEventListener('pagehide', () => this.flush({ keepalive: true }));
+    }
+
+    enqueue(questionId, answer, responseTime) {
+        return new Promise((resolve, reject) => {
+            this.pending.push({
+                answer: { question_id: questionId, answer: answer, response_time: responseTime },
+                resolve: resolve,
+                reject: reject
+            });
+            if (!this.flushTimer) {
+                this.flushTimer = setTimeout(() => this.flush(), this.flushDelay);
+            }
+        });
+    }
+
+    flush(options = {}) {
+        if (this.flushTimer) {
+            clearTimeout(this.flushTimer);
+            this.flushTimer = null;
+        }
+        const batch = this.pending;
+        this.pending = [];
+        if (!batch.length) return Promise.resolve();
+
+        return fetch(this.url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ answers: batch.map(entry => entry.answer) }),
+            keepalive: !!options.keepalive
+        })
+        .then(response => {
+            if (!response.ok) {
+                return response.text().then(text => {
+                    throw new Error(`HTTP error! status: ${response.status}, message: ${text || 'Server error'}`);
+                });
+            }
+            return response.json();
+        })
+        .then(data => {
+            const { results, xp_earned, ...shared } = data;
+            batch.forEach((entry, i) => {
+                const result = results[i] || { error: 'Missing result' };
+                // Quest toasts belong to the batch, not each answer
+                const extra = i === batch.length - 1 ? shared : { ...shared, quests_completed: [] };
+                if (result.error) {
+                    entry.reject(new Error(result.error));
+                } else {
+                    entry.resolve({ ...extra, ...result });
+                }
+            });
+        })
+        .catch(error => {
+            console.error('AnswerQueue: flush failed:', error);
+            batch.forEach(entry => entry.reject(error));
+        });
+    }
+}
+window.AnswerQueue = AnswerQueue;
+
 // Global battle state (initialize defaults, can be overridden by initializeBattleMode)
 window.bossHealth = 100;
 window.playerHealth = 100;
@@ -207,14 +278,15 @@ window.showResults = function() {
 };
 
 // Centralized feedback function
-window.showFeedback = function(questionId, data) {
+// Pass { advance: false } when the caller moves to the next question itself
+window.showFeedback = function(questionId, data, options = {}) {
     console.log(`Global showFeedback called for QID ${questionId} with data:`, data);
 
     const questionElement = document.querySelector(`.question-item[data-question-id='${questionId}']`);
     if (!questionElement) {
         console.error(`Global showFeedback: Could not find question element for QID ${questionId}`);
         // Still schedule next step even if feedback display fails
-        scheduleNextStepOrResults();
+        if (options.advance !== false) scheduleNextStepOrResults();
         return;
     }
 
@@ -324,7 +396,7 @@ window.showFeedback = function(questionId, data) {
     }
 
     // Schedule next step (common to both modes)
-    scheduleNextStepOrResults();
+    if (options.advance !== false) scheduleNextStepOrResults();
 };
 
 
@@ -438,6 +510,29 @@ function submitAnswer() {
     });
 }
 
+// Fetch the next training question (picked for the user's recent answers)
+// and fill the training page's question card with it
+function loadTrainingQuestion(url, index) {
+    return fetch(url)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            const question = data.question;
+            const item = document.querySelector('.question-item');
+            item.dataset.questionId = question.id;
+            document.getElementById('question-number').textContent = `Question #${index + 1}`;
+            const badge = document.getElementById('question-difficulty');
+            badge.className = `badge bg-secondary difficulty-badge-${question.difficulty}`;
+            badge.textContent = `Level ${question.difficulty}`;
+            document.getElementById('question-content').textContent = question.content;
+            return question;
+        });
+}
+
 // Default battle status handler (placeholder, might not be needed if showFeedback handles it)
 // function handleBattleStatus(status) { ... }
 
@@ -23,7 +23,13 @@ def create_app(config_class=Config):
     
     # Initialize extensions
     db.init_app(app)
-    migrate.init_app(app, db) # Initialize Migrate with app and db
+    # The full-text search index is created by search.py, not by migrations
+    from study_app.search import include_name
+    migrate.init_app(app, db, include_name=include_name) # Initialize Migrate with app and db
+    
+    # Cache AI responses on disk
+    from study_app import ai_cache
+    ai_cache.init_app(app)
     
     # Import and register blueprints
     from study_app.routes import main_bp
@@ -33,4 +39,24 @@ def create_app(config_class=Config):
     with app.app_context():
         db.create_all()
 
+    # Register the stats maintenance commands
+    from study_app import stats
+    stats.init_app(app)
+
+    # Register the question bank maintenance commands
+    from study_app import dedup
+    dedup.init_app(app)
+
+    # Create the full-text search index and register its commands
+    from study_app import search
+    search.init_app(app)
+
+    # Identify the current user once per request
+    from study_app import identity
+    identity.init_app(app)
+
+    # Start the background ingestion queue
+    from study_app import jobs
+    jobs.init_app(app)
+
     return app
\ No newline at end of file
@@ -0,0 +1,382 @@
+"""AI backends used for question generation.
+
+The backend is chosen with ``AI_BACKEND`` in the config:
+
+* ``gemini`` - Google Gemini (default)
+* ``fake`` - a local, deterministic stand-in with configurable latency,
+  error rate, request quota and malformed output, for load testing without
+  network access
+
+Either way ``get_backend`` wraps it in a ``RateLimitedBackend`` shared by
+every thread of the process: calls wait for a token-bucket rate limit and a
+concurrency cap, transient errors are retried with exponential backoff and
+jitter, and a circuit breaker fails calls fast while the service is down.
+"""
+from collections import deque
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from flask import current_app
+
+_backend_lock = threading.Lock()
+
+
+class AIBackend:
+    """Interface for text generation backends."""
+
+    model_name = None
+
+    def generate(self, prompt):
+        """Return the model's text response for ``prompt``."""
+        raise NotImplementedError
+
+    def generate_stream(self, prompt):
+        """Yield the model's response for ``prompt`` in pieces as it is written."""
+        yield self.generate(prompt)
+
+
+class GeminiBackend(AIBackend):
+    """Google Gemini, configured once per process."""
+
+    def __init__(self, api_key, model_name):
+        import google.generativeai as genai
+
+        if not api_key:
+            raise ValueError("Gemini API key not found. Please set GEMINI_API_KEY in .env file.")
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        # Configure for JSON output if the model supports it directly
+        # generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
+        # response = self.model.generate_content(prompt, generation_config=generation_config)
+        response = self.model.generate_content(prompt)
+        return response.text
+
+    def generate_stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+
+class AIUnavailableError(RuntimeError):
+    """The backend could not serve a request: retries ran out or the circuit is open."""
+
+
+class FakeBackendError(RuntimeError):
+    """Simulated transient backend failure raised by FakeBackend."""
+
+    retryable = True
+
+
+class FakeRateLimitError(FakeBackendError):
+    """Simulated quota error (HTTP 429) raised by FakeBackend."""
+
+    code = 429
+
+
+class FakeBackend(AIBackend):
+    """
+    Deterministic offline backend that answers question-generation prompts.
+
+    The same prompt always yields the same response. Questions are built from
+    sentences of the study content in the prompt. Errors are drawn per call,
+    so a retried request can succeed, and calls beyond ``quota_rps`` in any
+    one-second window fail like a quota error.
+    """
+
+    model_name = 'fake'
+
+    def __init__(self, latency=0.0, error_rate=0.0, malformed_rate=0.0, seed=0, quota_rps=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self.quota_rps = quota_rps
+        self._errors = random.Random(seed)
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        text = self._respond(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        return text
+
+    def generate_stream(self, prompt):
+        # One piece per question, spread over the latency like a streamed response
+        text = self._respond(prompt)
+        pieces = max(1, _prompt_int(prompt, r'generate (\d+) multiple-choice', 5))
+        for i in range(pieces):
+            if self.latency:
+                time.sleep(self.latency / pieces)
+            yield text[len(text) * i // pieces:len(text) * (i + 1) // pieces]
+
+    def _respond(self, prompt):
+        with self._lock:
+            now = time.monotonic()
+            if self.quota_rps:
+                while self._calls and self._calls[0] <= now - 1:
+                    self._calls.popleft()
+                if len(self._calls) >= self.quota_rps:
+                    raise FakeRateLimitError("Simulated quota exceeded")
+                self._calls.append(now)
+            failed = self._errors.random() < self.error_rate
+        if failed:
+            raise FakeBackendError("Simulated backend error")
+
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode('utf-8')).digest()
+        rng = random.Random(digest)
+
+        num_questions = _prompt_int(prompt, r'generate (\d+) multiple-choice', 5)
+        num_options = _prompt_int(prompt, r'list of (\d+) options', 4)
+        content = prompt.split('Study Content:', 1)[-1]
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', content) if len(s.split()) >= 4]
+        if not sentences:
+            sentences = ["The study content was empty."]
+
+        questions = []
+        for _ in range(num_questions):
+            sentence = sentences[rng.randrange(len(sentences))]
+            words = sentence.split()
+            answer = words[rng.randrange(len(words))]
+            options = [answer] + [f"{answer} ({n})" for n in range(1, num_options)]
+            questions.append({
+                "question": f"Which word completes: \"{sentence.replace(answer, '____', 1)}\"?",
+                "options": options,
+                "answer": answer,
+                "explanation": f"The text says: \"{sentence}\"",
+                "difficulty": rng.randint(1, 5),
+            })
+        text = json.dumps(questions)
+        if rng.random() < self.malformed_rate:
+            # Cut the JSON off mid-object, like a truncated model response
+            text = text[:max(1, len(text) // 2)]
+        return text
+
+
+def _prompt_int(prompt, pattern, default):
+    match = re.search(pattern, prompt)
+    return int(match.group(1)) if match else default
+
+
+# HTTP statuses worth retrying: timeouts, quota errors and server-side failures
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error):
+    """Whether a failed call may succeed if repeated."""
+    if isinstance(error, (ConnectionError, TimeoutError)) or getattr(error, 'retryable', False):
+        return True
+    # google.api_core exceptions carry the HTTP status as ``code``
+    return getattr(error, 'code', None) in RETRYABLE_STATUS
+
+
+def is_rate_limited(error):
+    return getattr(error, 'code', None) == 429
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing ``rate`` calls per second on average
+    and bursts of up to ``capacity`` calls.
+
+    A caller takes its token immediately and sleeps off any deficit, so
+    waiting callers are served in arrival order without polling.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def drain(self):
+        """Drop any saved-up burst, e.g. after the service reported a quota error."""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0)
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing service for a while.
+
+    After ``failure_threshold`` consecutive transient failures (quota errors
+    do not count, the service answered them) the circuit
+    opens and calls fail immediately. Once ``reset_timeout`` seconds have
+    passed a single trial call is let through: success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise ``AIUnavailableError`` unless the call may go ahead."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining <= 0 and not self._trial:
+                self._trial = True
+                return
+        raise AIUnavailableError(f"AI service unavailable after repeated errors; retrying in {max(remaining, 0):.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+
+class RateLimitedBackend(AIBackend):
+    """
+    Wrap a backend with a rate limit, a concurrency cap, retries and a circuit breaker.
+
+    One instance is shared by every thread of the process, so the limits
+    hold for ingestion workers and per-document generation threads alike.
+    """
+
+    def __init__(self, backend, requests_per_minute=0, burst=1, max_concurrency=8,
+                 max_retries=4, base_delay=1.0, max_delay=30.0,
+                 failure_threshold=5, reset_timeout=60.0):
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.bucket = TokenBucket(requests_per_minute / 60, burst) if requests_per_minute > 0 else None
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+
+    def generate(self, prompt):
+        return "".join(self._call(lambda: [self.backend.generate(prompt)]))
+
+    def generate_stream(self, prompt):
+        """
+        Stream the response, retrying only until its first piece arrives.
+
+        The concurrency slot is held until the stream is exhausted or closed.
+        """
+        return self._call(lambda: self.backend.generate_stream(prompt))
+
+    def _call(self, start):
+        """Run ``start()`` and yield its pieces under the limits, retrying transient errors."""
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            if self.bucket:
+                self.bucket.acquire()
+            started = False
+            with self._slots:
+                try:
+                    for piece in start():
+                        if not started:
+                            started = True
+                            self.breaker.record_success()
+                        yield piece
+                    if not started:
+                        self.breaker.record_success()
+                    return
+                except Exception as e:
+                    if not self._record_error(e) or started:
+                        # Not transient, or part of the response was already handed out
+                        raise
+                    error = e
+            attempt += 1
+            if attempt > self.max_retries:
+                raise AIUnavailableError(f"AI request failed after {attempt} attempts: {error}") from error
+            # Full jitter keeps threads that failed together from retrying together
+            time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))))
+
+    def _record_error(self, error):
+        """Update the breaker and bucket for a failed call. Returns whether to retry."""
+        if not is_retryable(error):
+            # The service answered; the request itself was bad
+            self.breaker.record_success()
+            return False
+        if is_rate_limited(error):
+            # The service is up but wants fewer calls: slow everyone down
+            self.breaker.record_success()
+            if self.bucket:
+                self.bucket.drain()
+        else:
+            self.breaker.record_failure()
+        return True
+
+
+def create_backend(config):
+    """Build the backend selected by ``AI_BACKEND`` in ``config``."""
+    name = config.get('AI_BACKEND', 'gemini')
+    if name == 'gemini':
+        return GeminiBackend(config.get('GEMINI_API_KEY'), config.get('GEMINI_MODEL'))
+    if name == 'fake':
+        return FakeBackend(
+            latency=config.get('AI_FAKE_LATENCY', 0.0),
+            error_rate=config.get('AI_FAKE_ERROR_RATE', 0.0),
+            malformed_rate=config.get('AI_FAKE_MALFORMED_RATE', 0.0),
+            seed=config.get('AI_FAKE_SEED', 0),
+            quota_rps=config.get('AI_FAKE_QUOTA_RPS', 0)
+        )
+    raise ValueError(f"Unknown AI_BACKEND '{name}'")
+
+
+def create_limited_backend(config):
+    """Build the configured backend wrapped with the ``AI_*`` request limits."""
+    return RateLimitedBackend(
+        create_backend(config),
+        requests_per_minute=config.get('AI_RATE_LIMIT_RPM', 0),
+        burst=config.get('AI_RATE_LIMIT_BURST', 1),
+        max_concurrency=config.get('AI_MAX_CONCURRENCY', 8),
+        max_retries=config.get('AI_MAX_RETRIES', 4),
+        base_delay=config.get('AI_RETRY_BASE_DELAY', 1.0),
+        max_delay=config.get('AI_RETRY_MAX_DELAY', 30.0),
+        failure_threshold=config.get('AI_CIRCUIT_FAILURES', 5),
+        reset_timeout=config.get('AI_CIRCUIT_RESET', 60.0)
+    )
+
+
+def get_model_name():
+    """Return the model name of the configured backend without creating it."""
+    if current_app.config.get('AI_BACKEND', 'gemini') == 'fake':
+        return FakeBackend.model_name
+    return current_app.config.get('GEMINI_MODEL')
+
+
+def get_backend():
+    """Return the app's rate-limited AI backend, creating it on first use."""
+    backend = current_app.extensions.get('ai_backend')
+    if backend is None:
+        with _backend_lock:
+            backend = current_app.extensions.get('ai_backend')
+            if backend is None:
+                backend = create_limited_backend(current_app.config)
+                current_app.extensions['ai_backend'] = backend
+    return backend
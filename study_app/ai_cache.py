@@ -0,0 +1,162 @@
+"""Disk-backed cache for AI model responses.
+
+Responses are stored in a SQLite file in the instance folder, keyed by a hash
+of the model name, prompt and generation parameters. Entries expire after a
+TTL, and the least recently used entries are evicted once the cache grows
+beyond its size limit.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import click
+from flask import current_app
+
+
+class ResponseCache:
+    """A size-bounded LRU cache of model responses with TTL."""
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, ttl=30 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_accessed_at "
+                         "ON response_cache (accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS response_cache_stats ("
+                         " name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _count(conn, name, amount=1):
+        conn.execute("INSERT INTO response_cache_stats (name, value) VALUES (?, ?) "
+                     "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    @staticmethod
+    def make_key(model_name, prompt, **params):
+        """Hash the model name, prompt and generation parameters into a key."""
+        payload = json.dumps({'model': model_name, 'prompt': prompt, 'params': params}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for ``key``, or None on a miss."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT response, created_at FROM response_cache WHERE key = ?",
+                               (key,)).fetchone()
+            if row and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                row = None
+            if row:
+                conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count(conn, 'hits' if row else 'misses')
+        return row[0] if row else None
+
+    def set(self, key, response):
+        """Store a response and evict old entries if over the size limit."""
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO response_cache (key, response, size, created_at, accessed_at) "
+                         "VALUES (?, ?, ?, ?, ?)", (key, response, size, now, now))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Delete expired entries, then least recently used ones until under max_bytes."""
+        evicted = conn.execute("DELETE FROM response_cache WHERE created_at < ?",
+                               (time.time() - self.ttl,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+        if total > self.max_bytes:
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM response_cache ORDER BY accessed_at"):
+                if total <= self.max_bytes:
+                    break
+                victims.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM response_cache WHERE key = ?", victims)
+            evicted += len(victims)
+        if evicted:
+            self._count(conn, 'evictions', evicted)
+
+    def clear(self):
+        """Delete all entries and reset the counters."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM response_cache")
+            conn.execute("DELETE FROM response_cache_stats")
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current cache size."""
+        with self._connect() as conn:
+            entries, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache").fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM response_cache_stats"))
+        return {
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'evictions': counters.get('evictions', 0),
+            'entries': entries,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+        }
+
+
+def init_app(app):
+    """Create the response cache for the app and register its CLI commands."""
+    if app.config.get('AI_CACHE_ENABLED', True):
+        os.makedirs(app.instance_path, exist_ok=True)
+        app.extensions['ai_cache'] = ResponseCache(
+            os.path.join(app.instance_path, app.config.get('AI_CACHE_FILE', 'ai_cache.sqlite')),
+            max_bytes=app.config.get('AI_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+            ttl=app.config.get('AI_CACHE_TTL', 30 * 24 * 3600)
+        )
+    app.cli.add_command(ai_cache_cli)
+
+
+def get_response_cache():
+    """Return the app's response cache, or None if caching is disabled."""
+    return current_app.extensions.get('ai_cache')
+
+
+@click.group('ai-cache')
+def ai_cache_cli():
+    """Manage the AI response cache."""
+
+
+@ai_cache_cli.command('stats')
+def cache_stats_command():
+    """Print cache size and counters."""
+    cache = get_response_cache()
+    if not cache:
+        click.echo("AI response cache is disabled.")
+        return
+    for name, value in cache.stats().items():
+        click.echo(f"{name}: {value}")
+
+
+@ai_cache_cli.command('clear')
+def cache_clear_command():
+    """Delete all cached responses."""
+    cache = get_response_cache()
+    if cache:
+        cache.clear()
+    click.echo("AI response cache cleared.")
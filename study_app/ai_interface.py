@@ -1,33 +1,17 @@
-import google.generativeai as genai
 import os
 import json # Import json for parsing
+from concurrent.futures import ThreadPoolExecutor
+import queue
+from itertools import groupby
 from flask import current_app
 import random # Import random for shuffling options
+from study_app.pdf_processor import CHARS_PER_TOKEN
+from study_app.ai_cache import ResponseCache, get_response_cache
+from study_app.ai_backends import get_backend, get_model_name
 
-def initialize_gemini():
-    """Initialize the Gemini API with the API key."""
-    api_key = current_app.config.get('GEMINI_API_KEY')
-    if not api_key:
-        raise ValueError("Gemini API key not found. Please set GEMINI_API_KEY in .env file.")
-    
-    genai.configure(api_key=api_key)
-    return genai
-
-def generate_questions(content, num_questions=5, num_options=4):
-    """
-    Generate multiple-choice questions from the provided content using Gemini API.
-    
-    Args:
-        content (str): The text content to generate questions from
-        num_questions (int): Number of questions to generate
-        num_options (int): Total number of options per question (including the correct one)
-        
-    Returns:
-        list: List of dictionaries containing question, options, answer, explanation, and difficulty
-    """
-    genai_client = initialize_gemini()
-    
-    prompt = f"""
+def build_prompt(content, num_questions=5, num_options=4, max_content_chars=8000):
+    """Return the question-generation prompt for ``content``."""
+    return f"""
     Based on the following study content, generate {num_questions} multiple-choice quiz questions with varying difficulty levels.
     For each question:
     1. Create a challenging but clear question.
@@ -52,63 +36,328 @@ def generate_questions(content, num_questions=5, num_options=4):
     Ensure the entire output is ONLY the JSON list, starting with [ and ending with ]. Make sure the "options" list contains exactly {num_options} strings.
     
     Study Content:
-    {content[:8000]}  # Limiting content length 
+    {content[:max_content_chars]}
+    """
+
+def is_valid_question(q, num_options=4):
+    """Check a generated question has every key, ``num_options`` options and an answer among them."""
+    return (isinstance(q, dict) and
+            all(k in q for k in ["question", "options", "answer", "explanation", "difficulty"]) and
+            isinstance(q.get("options"), list) and
+            len(q.get("options")) == num_options and
+            q.get("answer") in q.get("options"))  # Ensure the answer is one of the options
+
+def parse_questions(response_text, num_options=4):
     """
+    Parse and validate a complete model response.
+    
+    Returns:
+        list: The question dictionaries
+        
+    Raises:
+        ValueError: The response is not a JSON list of valid questions
+    """
+    # Find the start and end of the JSON list
+    start_index = response_text.find('[')
+    end_index = response_text.rfind(']')
+    
+    if start_index != -1 and end_index != -1:
+        json_text = response_text[start_index:end_index+1]
+        try:
+            questions = json.loads(json_text)
+        except json.JSONDecodeError as e:
+            print(f"Error decoding JSON from Gemini: {e}")
+            print(f"Raw response text:\n{response_text}")
+            raise ValueError("Failed to parse JSON response")
+        # Validate structure
+        if isinstance(questions, list) and all(is_valid_question(q, num_options) for q in questions):
+            return questions
+        print("Error: Generated JSON does not match expected structure or content.")
+        print(f"Problematic JSON text: {json_text}")
+        raise ValueError("Invalid JSON structure or content")
+    print("Error: Could not find JSON list in Gemini response.")
+    print(f"Raw response text:\n{response_text}")
+    raise ValueError("No JSON list found in response")
+
+def generate_questions(content, num_questions=5, num_options=4, max_content_chars=8000, use_cache=True):
+    """
+    Generate multiple-choice questions from the provided content using the configured AI backend.
+    
+    Args:
+        content (str): The text content to generate questions from
+        num_questions (int): Number of questions to generate
+        num_options (int): Total number of options per question (including the correct one)
+        max_content_chars (int): Content beyond this length is not sent to the model.
+            Long documents are split into chunks and generated with
+            ``stream_questions_per_chunk``.
+        use_cache (bool): Set to False to bypass cached responses and ask the
+            model again (the fresh response still replaces the cached one).
+        
+    Returns:
+        list: List of dictionaries containing question, options, answer, explanation, and difficulty
+        
+    Raises:
+        AIUnavailableError: The backend kept failing or its circuit is open
+        ValueError: The response was not a valid question list
+    """
+    prompt = build_prompt(content, num_questions, num_options, max_content_chars)
+    model_name = get_model_name()
+    
+    # Identical prompts and parameters are served from the response cache
+    cache = get_response_cache()
+    cache_key = ResponseCache.make_key(model_name, prompt,
+                                       num_questions=num_questions, num_options=num_options)
+    response_text = cache.get(cache_key) if cache and use_cache else None
+    from_cache = response_text is not None
     
     try:
-        # Use a model known for JSON output if available, otherwise use a standard one
-        # Consider models optimized for JSON or function calling if available
-        model = genai_client.GenerativeModel('models/gemini-2.5-flash-preview-04-17') # Hello agent trying to use a specific model, that is not this one. Don't use it. The ONLY model we are using is the one I am using here.
+        if not from_cache:
+            response_text = get_backend().generate(prompt)
+        questions = parse_questions(response_text, num_options)
+    except Exception as e:
+        # Failures are raised rather than saved as placeholder questions
+        print(f"Error generating questions with {model_name}: {str(e)}")
+        raise
+    
+    # Only cache responses that parsed and validated
+    if cache and not from_cache:
+        cache.set(cache_key, response_text)
+    # Shuffle options for each question
+    for q in questions:
+        random.shuffle(q['options'])
+    return questions[:num_questions] # Return only the requested number
+
+def iter_json_objects(fragments):
+    """
+    Yield the elements of a streamed JSON list as soon as each one is complete.
+    
+    Text before the opening ``[`` (such as a Markdown code fence) is skipped,
+    and fragments after the closing ``]`` are consumed but not parsed, so the
+    stream is always read to the end. Only the string and nesting
+    state is carried between fragments, so every character is scanned once
+    and every element decoded once. An element cut off by the end of the
+    stream is dropped.
+    
+    Args:
+        fragments (iterable): Pieces of the response text
         
-        # Configure for JSON output if the model supports it directly
-        # generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
-        # response = model.generate_content(prompt, generation_config=generation_config)
+    Yields:
+        The decoded elements (dicts for a question list)
         
-        # Generic call if JSON mode isn't explicitly supported or fails
-        response = model.generate_content(prompt)
+    Raises:
+        ValueError: A complete element is not valid JSON
+    """
+    buffer = ""
+    in_list = in_string = escaped = closed = False
+    depth = 0
+    for fragment in fragments:
+        if closed:
+            continue
+        scan_from = len(buffer)
+        buffer += fragment
+        for index in range(scan_from, len(buffer)):
+            char = buffer[index]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif not in_list:
+                in_list = char == '['
+                start = index + 1
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                if depth == 0:
+                    start = index
+                depth += 1
+            elif char in '}]':
+                if depth == 0:
+                    closed = True
+                    break
+                depth -= 1
+                if depth == 0:
+                    yield json.loads(buffer[start:index + 1])
+                    start = index + 1
+        # Keep only the unfinished element
+        buffer = buffer[start:] if in_list else ""
+        start = 0
+
+def stream_questions(content, num_questions=5, num_options=4, max_content_chars=8000, use_cache=True):
+    """
+    Generate questions like ``generate_questions``, yielding each one as soon as the model has written it.
+    
+    The model's response is streamed and parsed incrementally, so the first
+    question is ready long before the whole response. Invalid questions are
+    skipped. A response that validates as a whole is cached.
+    
+    Args:
+        content (str): The text content to generate questions from
+        num_questions (int): Number of questions to generate
+        num_options (int): Total number of options per question (including the correct one)
+        max_content_chars (int): Content beyond this length is not sent to the model
+        use_cache (bool): Set to False to bypass cached responses
         
-        response_text = response.text
+    Yields:
+        dict: Question with question, options, answer, explanation and difficulty
         
-        # Clean the response text to ensure it's valid JSON
-        # Find the start and end of the JSON list
-        start_index = response_text.find('[')
-        end_index = response_text.rfind(']')
+    Raises:
+        AIUnavailableError: The backend kept failing or its circuit is open
+        ValueError: The response held no valid question
+    """
+    prompt = build_prompt(content, num_questions, num_options, max_content_chars)
+    model_name = get_model_name()
+    cache = get_response_cache()
+    cache_key = ResponseCache.make_key(model_name, prompt,
+                                       num_questions=num_questions, num_options=num_options)
+    cached = cache.get(cache_key) if cache and use_cache else None
+    
+    response = []
+    def record(fragments):
+        for fragment in fragments:
+            response.append(fragment)
+            yield fragment
+    
+    yielded = skipped = 0
+    try:
+        fragments = [cached] if cached is not None else record(get_backend().generate_stream(prompt))
+        for q in iter_json_objects(fragments):
+            if not is_valid_question(q, num_options):
+                print(f"Skipping invalid generated question: {q}")
+                skipped += 1
+                continue
+            if yielded < num_questions:
+                random.shuffle(q['options'])
+                yielded += 1
+                yield q
+        if not yielded:
+            raise ValueError("No valid questions in response")
+    except Exception as e:
+        print(f"Error streaming questions with {model_name}: {str(e)}")
+        raise
+    
+    # A cut-off response (fewer questions) is not worth checking
+    if cache and cached is None and yielded == num_questions and not skipped:
+        response_text = "".join(response)
+        try:
+            parse_questions(response_text, num_options)
+        except ValueError:
+            return
+        cache.set(cache_key, response_text)
+
+
+def distribute_questions(num_chunks, num_questions):
+    """
+    Spread a question budget across document chunks.
+    
+    Args:
+        num_chunks (int): Number of chunks in the document
+        num_questions (int): Total number of questions requested
         
-        if start_index != -1 and end_index != -1:
-            json_text = response_text[start_index:end_index+1]
-            try:
-                questions = json.loads(json_text)
-                # Validate structure
-                if isinstance(questions, list) and all(
-                    isinstance(q, dict) and 
-                    all(k in q for k in ["question", "options", "answer", "explanation", "difficulty"]) and
-                    isinstance(q.get("options"), list) and 
-                    len(q.get("options")) == num_options and
-                    q.get("answer") in q.get("options") # Ensure the answer is one of the options
-                    for q in questions
-                ):
-                    # Shuffle options for each question
-                    for q in questions:
-                        random.shuffle(q['options'])
-                    return questions[:num_questions] # Return only the requested number
-                else:
-                    print("Error: Generated JSON does not match expected structure or content.")
-                    print(f"Problematic JSON text: {json_text}")
-                    raise ValueError("Invalid JSON structure or content")
-            except json.JSONDecodeError as e:
-                print(f"Error decoding JSON from Gemini: {e}")
-                print(f"Raw response text:\n{response_text}")
-                raise ValueError("Failed to parse JSON response")
+    Returns:
+        list: ``(chunk_index, count)`` pairs with ``count > 0``. When there are
+        more chunks than questions, evenly spaced chunks get one question each.
+    """
+    if num_chunks <= 0 or num_questions <= 0:
+        return []
+    if num_questions < num_chunks:
+        step = num_chunks / num_questions
+        return [(int(i * step), 1) for i in range(num_questions)]
+    base, extra = divmod(num_questions, num_chunks)
+    return [(i, base + (1 if i < extra else 0)) for i in range(num_chunks)]
+
+def plan_chunk_questions(question_counts, num_questions):
+    """
+    Spread a question budget over the chunks with the fewest questions.
+    
+    Chunks are filled in order of how many questions they already have; among
+    equally covered chunks the budget is spread evenly across the document as
+    in ``distribute_questions``. For a new document (all counts zero) the
+    result matches ``distribute_questions``.
+    
+    Args:
+        question_counts (list): Existing questions per chunk, in document order
+        num_questions (int): Total number of questions requested
+        
+    Returns:
+        list: ``(chunk_index, count)`` pairs with ``count > 0``, in document order
+    """
+    num_chunks = len(question_counts)
+    if num_chunks <= 0 or num_questions <= 0:
+        return []
+    # sorted() is stable, so equally covered chunks stay in document order
+    by_coverage = sorted(range(num_chunks), key=lambda i: question_counts[i])
+    if num_questions >= num_chunks:
+        # Every chunk gets questions; the remainder goes to the least covered
+        plan = [(by_coverage[i], count) for i, count in distribute_questions(num_chunks, num_questions)]
+        return sorted(plan)
+    
+    picked = []
+    for _, tier in groupby(by_coverage, key=lambda i: question_counts[i]):
+        tier = list(tier)
+        needed = num_questions - len(picked)
+        if len(tier) <= needed:
+            picked.extend(tier)
         else:
-            print("Error: Could not find JSON list in Gemini response.")
-            print(f"Raw response text:\n{response_text}")
-            raise ValueError("No JSON list found in response")
+            picked.extend(tier[i] for i, _ in distribute_questions(len(tier), needed))
+            break
+    return [(index, 1) for index in sorted(picked)]
 
-    except Exception as e:
-        print(f"Error generating questions with Gemini: {str(e)}")
-        # Return error indicator or fallback mock data
-        return [{"question": f"Error generating question: {e}", 
-                 "options": ["N/A"] * num_options,
-                 "answer": "N/A", 
-                 "explanation": "Could not connect to AI or parse response.", 
-                 "difficulty": 1}] * num_questions
+def stream_questions_per_chunk(planned, num_options=4, use_cache=True):
+    """
+    Stream questions for several chunks at once, in the order they are written.
+    
+    The per-chunk requests run concurrently on a bounded thread pool
+    (``GENERATION_CONCURRENCY``), so wall-clock time stays close to a single
+    call, and each question is handed over as soon as it has been parsed. A
+    chunk whose request fails contributes the questions it produced before
+    failing, and is left first in line for regeneration.
+    
+    Args:
+        planned (iterable): ``(chunk_text, num_questions)`` pairs
+        num_options (int): Total number of options per question
+        use_cache (bool): Passed to ``stream_questions``
+        
+    Yields:
+        tuple: ``(index, question)`` where ``index`` is the pair's position in ``planned``
+        
+    Raises:
+        Exception: The first error, if no request produced a question
+    """
+    app = current_app._get_current_object()
+    chunk_size = current_app.config.get('QUESTION_CHUNK_TOKENS', 2000) * CHARS_PER_TOKEN
+    planned = list(planned)
+    # (index, question, error); question is None once a request has finished
+    results = queue.Queue()
+    
+    def stream_chunk(index, chunk, count):
+        with app.app_context():
+            try:
+                for question in stream_questions(chunk, num_questions=count, num_options=num_options,
+                                                 max_content_chars=chunk_size, use_cache=use_cache):
+                    results.put((index, question, None))
+            except Exception as e:
+                results.put((index, None, e))
+            else:
+                results.put((index, None, None))
+    
+    errors = []
+    produced = False
+    max_workers = max(1, current_app.config.get('GENERATION_CONCURRENCY', 4))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='generate') as executor:
+        for index, (chunk, count) in enumerate(planned):
+            executor.submit(stream_chunk, index, chunk, count)
+        finished = 0
+        while finished < len(planned):
+            index, question, error = results.get()
+            if question is not None:
+                produced = True
+                yield index, question
+                continue
+            finished += 1
+            if error is not None:
+                errors.append(error)
+    if errors and not produced:
+        raise errors[0]
@@ -0,0 +1,301 @@
+"""Near-duplicate detection for a topic's question bank.
+
+A question's text is reduced to the set of its normalized character 5-grams,
+and that set to a 64-value MinHash signature: the fraction of equal positions
+in two signatures estimates the Jaccard similarity of their shingle sets.
+The signature is cut into 32 bands of 2 values and each band is hashed,
+together with the normalized answer, to a bucket (locality-sensitive
+hashing). Only questions sharing a bucket are compared, so checking a new
+question is one indexed lookup per band rather than a scan of the whole
+topic. Keying buckets on the answer keeps look-alike questions with
+different answers ("When did World War I end?") apart.
+
+With 32 bands of 2 values, two questions with the same answer and text
+similarity 0.5 share a bucket with probability >0.99. Lower similarities
+produce more candidates, but only among questions with the same answer.
+
+``screen_questions`` filters generated questions before they are saved, and
+``flask questions dedupe`` indexes existing questions and merges the
+near-duplicates already in the bank.
+"""
+from collections import namedtuple
+from itertools import groupby
+import hashlib
+import random
+import re
+import struct
+import zlib
+
+import click
+from flask import current_app
+
+from study_app import db
+from study_app.models import Topic, Question, QuestionSignature, QuestionBucket, UserResponse, ReviewState
+
+NUM_PERM = 64
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+_PRIME = (1 << 61) - 1
+# Signatures are stored, so the hash permutations must never change
+_seed = random.Random(20261018)
+_PERMUTATIONS = [(_seed.randrange(1, _PRIME), _seed.randrange(_PRIME)) for _ in range(NUM_PERM)]
+_SIGNATURE = struct.Struct(f'<{NUM_PERM}I')
+_BAND = struct.Struct(f'<I{ROWS}I')
+_NON_WORD = re.compile(r'[\W_]+')
+
+# Rows per statement when indexing or deleting in bulk
+BATCH_SIZE = 500
+
+
+Fingerprint = namedtuple('Fingerprint', ['signature', 'buckets'])
+
+
+def normalize(text):
+    """Lowercase ``text`` and reduce punctuation and whitespace runs to single spaces."""
+    return _NON_WORD.sub(' ', (text or '').lower()).strip()
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Return the set of ``size``-character substrings of the normalized text."""
+    text = normalize(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(text):
+    """Return the MinHash signature of ``text`` as a tuple of ``NUM_PERM`` 32-bit ints."""
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) & 0xFFFFFFFF for a, b in _PERMUTATIONS)
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(signature, other)) / NUM_PERM
+
+
+def buckets(signature, answer):
+    """Return one signed 64-bit bucket key per LSH band of ``signature``, scoped to ``answer``."""
+    answer = normalize(answer).encode('utf-8')
+    keys = []
+    for band in range(BANDS):
+        values = _BAND.pack(band, *signature[band * ROWS:(band + 1) * ROWS])
+        digest = hashlib.blake2b(values + answer, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def fingerprint(content, answer):
+    """Return the signature and bucket keys of a question."""
+    signature = minhash(content)
+    return Fingerprint(signature, buckets(signature, answer))
+
+
+def screen_questions(topic_id, rows, threshold=None):
+    """
+    Find the near-duplicates in a batch of questions about to be saved.
+
+    A row is a near-duplicate when it has the same answer as, and text at
+    least ``threshold`` similar to, a question already indexed for the topic
+    or an earlier row of the batch. The existing candidates are fetched with
+    one query over the batch's buckets.
+
+    Args:
+        topic_id (int): Topic the questions will be saved to
+        rows (list): Rows built with ``persistence.question_row``
+        threshold (float, optional): Defaults to ``DEDUP_THRESHOLD``
+
+    Returns:
+        list: One ``Fingerprint`` per row, or None where the row is a near-duplicate
+    """
+    if threshold is None:
+        threshold = current_app.config.get('DEDUP_THRESHOLD', 0.5)
+    fingerprints = [fingerprint(row['content'], row['answer']) for row in rows]
+
+    candidates = {}
+    keys = {key for fp in fingerprints for key in fp.buckets}
+    if keys:
+        for bucket, data in db.session.execute(
+            db.select(QuestionBucket.bucket, QuestionSignature.minhash)
+            .join(QuestionSignature, QuestionSignature.question_id == QuestionBucket.question_id)
+            .where(QuestionBucket.topic_id == topic_id, QuestionBucket.bucket.in_(keys))
+        ):
+            candidates.setdefault(bucket, []).append(_SIGNATURE.unpack(data))
+
+    screened = []
+    for fp in fingerprints:
+        if any(similarity(fp.signature, other) >= threshold
+               for key in fp.buckets for other in candidates.get(key, ())):
+            screened.append(None)
+            continue
+        screened.append(fp)
+        for key in fp.buckets:
+            candidates.setdefault(key, []).append(fp.signature)
+    return screened
+
+
+def index_questions(entries):
+    """
+    Store signatures and LSH buckets for saved questions. Nothing is committed.
+
+    Args:
+        entries (iterable): ``(question_id, topic_id, fingerprint)`` triples
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    db.session.execute(db.insert(QuestionSignature), [
+        {'question_id': question_id, 'topic_id': topic_id, 'minhash': _SIGNATURE.pack(*fp.signature)}
+        for question_id, topic_id, fp in entries
+    ])
+    db.session.execute(db.insert(QuestionBucket), [
+        {'question_id': question_id, 'bucket': bucket, 'topic_id': topic_id}
+        for question_id, topic_id, fp in entries
+        for bucket in set(fp.buckets)
+    ])
+
+
+def index_missing(topic_id):
+    """Index the topic's questions that have no signature yet. Returns how many were indexed."""
+    indexed = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Question.id, Question.content, Question.answer)
+            .outerjoin(QuestionSignature, QuestionSignature.question_id == Question.id)
+            .where(Question.topic_id == topic_id, QuestionSignature.question_id.is_(None))
+            .order_by(Question.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return indexed
+        index_questions((question_id, topic_id, fingerprint(content, answer))
+                        for question_id, content, answer in rows)
+        indexed += len(rows)
+
+
+def find_duplicates(topic_id, threshold):
+    """
+    Group the topic's indexed questions into near-duplicate clusters.
+
+    Only questions sharing an LSH bucket (and so an answer) are compared.
+    Clusters are joined transitively and each keeps its oldest (lowest id)
+    question.
+
+    Returns:
+        dict: ``{duplicate_id: keeper_id}``
+    """
+    signatures = {question_id: _SIGNATURE.unpack(data) for question_id, data in db.session.execute(
+        db.select(QuestionSignature.question_id, QuestionSignature.minhash)
+        .where(QuestionSignature.topic_id == topic_id)
+    )}
+    parent = {}
+
+    def find(question_id):
+        while parent.get(question_id, question_id) != question_id:
+            question_id = parent[question_id]
+        return question_id
+
+    members = db.session.execute(
+        db.select(QuestionBucket.bucket, QuestionBucket.question_id)
+        .where(QuestionBucket.topic_id == topic_id)
+        .order_by(QuestionBucket.bucket, QuestionBucket.question_id)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    for _, group in groupby(members, key=lambda row: row[0]):
+        question_ids = [question_id for _, question_id in group]
+        for i, first in enumerate(question_ids):
+            for second in question_ids[i + 1:]:
+                first_root, second_root = find(first), find(second)
+                if first_root == second_root:
+                    continue
+                if similarity(signatures[first], signatures[second]) >= threshold:
+                    parent[max(first_root, second_root)] = min(first_root, second_root)
+    return {question_id: find(question_id) for question_id in parent}
+
+
+def merge_duplicates(duplicates):
+    """
+    Move answers and review schedules to the kept questions and delete the duplicates.
+
+    Nothing is committed.
+
+    Args:
+        duplicates (dict): ``{duplicate_id: keeper_id}`` from ``find_duplicates``
+    """
+    if not duplicates:
+        return
+    pairs = [{'duplicate': duplicate, 'keeper': keeper} for duplicate, keeper in duplicates.items()]
+    response = UserResponse.__table__
+    db.session.execute(
+        response.update()
+        .where(response.c.question_id == db.bindparam('duplicate'))
+        .values(question_id=db.bindparam('keeper')),
+        pairs
+    )
+
+    # A user keeps the schedule they already have for the kept question.
+    # Pairs run one at a time so several duplicates of one keeper cannot collide.
+    review = ReviewState.__table__
+    kept = review.alias('kept')
+    for pair in pairs:
+        db.session.execute(
+            review.delete().where(
+                review.c.question_id == pair['duplicate'],
+                db.exists().where(kept.c.user_id == review.c.user_id, kept.c.question_id == pair['keeper'])
+            )
+        )
+        db.session.execute(
+            review.update()
+            .where(review.c.question_id == pair['duplicate'])
+            .values(question_id=pair['keeper'])
+        )
+
+    duplicate_ids = list(duplicates)
+    for start in range(0, len(duplicate_ids), BATCH_SIZE):
+        batch = duplicate_ids[start:start + BATCH_SIZE]
+        for model, column in ((QuestionBucket, QuestionBucket.question_id),
+                              (QuestionSignature, QuestionSignature.question_id),
+                              (Question, Question.id)):
+            db.session.execute(db.delete(model).where(column.in_(batch)))
+
+
+def dedupe_topic(topic_id, threshold=None, merge=True):
+    """
+    Index a topic's unindexed questions and merge its near-duplicates, then commit.
+
+    Returns:
+        tuple: ``(questions_indexed, duplicates)`` where ``duplicates`` maps
+        each duplicate id to the id of the question it was merged into
+    """
+    if threshold is None:
+        threshold = current_app.config.get('DEDUP_THRESHOLD', 0.5)
+    indexed = index_missing(topic_id)
+    duplicates = find_duplicates(topic_id, threshold)
+    if merge:
+        merge_duplicates(duplicates)
+    db.session.commit()
+    return indexed, duplicates
+
+
+def init_app(app):
+    app.cli.add_command(questions_cli)
+
+
+@click.group('questions')
+def questions_cli():
+    """Maintain the question bank."""
+
+
+@questions_cli.command('dedupe')
+@click.option('--topic-id', type=int, help="Only this topic (default: every topic).")
+@click.option('--threshold', type=float, help="Similarity from which questions are merged (default: DEDUP_THRESHOLD).")
+@click.option('--dry-run', is_flag=True, help="Index and report near-duplicates without merging them.")
+def dedupe_command(topic_id, threshold, dry_run):
+    """Merge near-duplicate questions within each topic."""
+    topic_ids = [topic_id] if topic_id else db.session.scalars(db.select(Topic.id).order_by(Topic.id)).all()
+    for current in topic_ids:
+        indexed, duplicates = dedupe_topic(current, threshold, merge=not dry_run)
+        verb = "found" if dry_run else "merged"
+        click.echo(f"Topic {current}: indexed {indexed} questions, {verb} {len(duplicates)} near-duplicates.")
@@ -1,7 +1,11 @@
 from study_app import db
 import math
+from collections import namedtuple
 from study_app.models import User
 
+# Rolling results of a user's most recent answers on a topic
+Performance = namedtuple('Performance', ['answered', 'accuracy', 'avg_time', 'avg_difficulty'])
+
 def calculate_xp(is_correct, response_time, difficulty):
     """
     Calculate experience points earned based on answer correctness, response time, and question difficulty.
@@ -90,28 +94,65 @@ def check_battle_success(battle):
         battle.status = "lost"
         return False
 
-def get_next_question_difficulty(previous_responses):
+def recent_performance(user_id, topic_id, db_session, window=20):
+    """
+    Aggregate the user's last ``window`` answers on a topic in one query.
+
+    The window is read newest-first through the (user_id, topic_id,
+    created_at) index on UserResponse, so the cost does not grow with the
+    user's history.
+
+    Args:
+        user_id (int): The ID of the user.
+        topic_id (int): The topic being trained.
+        db_session: Database session.
+        window (int): Number of most recent answers to consider.
+
+    Returns:
+        Performance: ``(answered, accuracy, avg_time, avg_difficulty)``;
+        the averages are None when nothing has been answered yet.
+    """
+    recent = recent_answers(user_id, topic_id, window)
+    answered, accuracy, avg_time, avg_difficulty = db_session.execute(db.select(
+        db.func.count(),
+        db.func.avg(db.case((recent.c.is_correct, 1.0), else_=0.0)),
+        db.func.avg(recent.c.response_time),
+        db.func.avg(recent.c.difficulty),
+    )).one()
+    return Performance(answered, accuracy, avg_time, avg_difficulty)
+
+
+def recent_answers(user_id, topic_id, window):
+    """Subquery of the user's last ``window`` answers on a topic, newest first."""
+    from study_app.models import Question, UserResponse  # Local import to avoid circular
+
+    return (
+        db.select(UserResponse.question_id, UserResponse.is_correct,
+                  UserResponse.response_time, Question.difficulty)
+        .join(Question, Question.id == UserResponse.question_id)
+        .where(UserResponse.user_id == user_id, UserResponse.topic_id == topic_id)
+        .order_by(UserResponse.created_at.desc())
+        .limit(window)
+        .subquery()
+    )
+
+
+def get_next_question_difficulty(performance):
     """
     Determine the difficulty of the next question based on previous answers.
     
     Args:
-        previous_responses (list): List of previous user responses
+        performance (Performance): Recent results, from ``recent_performance``
         
     Returns:
         int: Recommended difficulty level for next question (1-5)
     """
-    if not previous_responses:
+    if not performance.answered:
         return 1  # Start with easy questions
     
-    # Calculate percentage of correct answers
-    correct_count = sum(1 for resp in previous_responses if resp.is_correct)
-    correct_percentage = correct_count / len(previous_responses)
-    
-    # Calculate average response time
-    avg_time = sum(resp.response_time for resp in previous_responses) / len(previous_responses)
-    
-    # Calculate average difficulty of previous questions
-    avg_difficulty = sum(resp.question.difficulty for resp in previous_responses) / len(previous_responses)
+    correct_percentage = performance.accuracy
+    avg_time = performance.avg_time if performance.avg_time is not None else 0.0
+    avg_difficulty = performance.avg_difficulty
     
     # Determine next difficulty
     if correct_percentage >= 0.8 and avg_time < 15:
@@ -122,7 +163,7 @@ def get_next_question_difficulty(previous_responses):
         return max(1, math.floor(avg_difficulty - 1))
     else:
         # Keep difficulty roughly the same
-        return round(avg_difficulty)
+        return min(5, max(1, round(avg_difficulty)))
 
 def calculate_combo_bonus(consecutive_correct):
     """
@@ -152,29 +193,81 @@ def award_xp(user_id, xp_to_add, db_session):
     return False
 
 
-def update_quest_progress(user_id, db_session, quest_type=None, increment=1):
-    """Increment progress on active quests for a user.
+def add_xp(user_id, xp_to_add, db_session):
+    """
+    Atomically add XP to a user and update their level in one UPDATE.
 
     Args:
         user_id (int): The ID of the user.
-        db_session: Database session.
+        xp_to_add (int): XP to add.
+        db_session: Database session. The change is not committed.
+
+    Returns:
+        tuple: ``(level, total_xp, leveled_up)`` after the update, or None if
+        the user does not exist.
+    """
+    new_total = User.total_xp + xp_to_add
+    new_level = new_total // 100 + 1  # Simple leveling formula: level = experience // 100 + 1
+    row = db_session.execute(
+        db.update(User)
+        .where(User.id == user_id)
+        .values(total_xp=new_total,
+                level=db.case((User.level > new_level, User.level), else_=new_level))
+        .returning(User.level, User.total_xp)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        return None
+    level, total_xp = row
+    leveled_up = xp_to_add > 0 and total_xp // 100 > (total_xp - xp_to_add) // 100 and level == total_xp // 100 + 1
+    return level, total_xp, leveled_up
+
+
+def advance_quests(user_id, db_session, quest_type=None, increment=1):
+    """
+    Increment progress on a user's active quests with a single UPDATE.
+
+    Args:
+        user_id (int): The ID of the user.
+        db_session: Database session. The change is not committed.
         quest_type (str, optional): Filter quests by this type. If ``None`` all
             active quests will be updated.
         increment (int): Amount to increment progress by.
+
+    Returns:
+        list: ``(title, reward_xp)`` for each quest completed by this update.
     """
     from study_app.models import Quest  # Local import to avoid circular
 
-    completed_titles = []
-    query = Quest.query.filter_by(user_id=user_id, completed=False)
+    stmt = (
+        db.update(Quest)
+        .where(Quest.user_id == user_id, Quest.completed.is_(False))
+        .values(progress=Quest.progress + increment,
+                completed=Quest.progress + increment >= Quest.target)
+        .returning(Quest.title, Quest.completed, Quest.reward_xp)
+        .execution_options(synchronize_session=False)
+    )
     if quest_type:
-        query = query.filter_by(quest_type=quest_type)
-    quests = query.all()
-    for quest in quests:
-        quest.progress += increment
-        if quest.progress >= quest.target:
-            quest.completed = True
-            completed_titles.append(quest.title)
-            award_xp(user_id, quest.reward_xp, db_session)
-    if quests:
-        db_session.commit()
-    return completed_titles
+        stmt = stmt.where(Quest.quest_type == quest_type)
+    return [(title, reward_xp or 0) for title, completed, reward_xp in db_session.execute(stmt) if completed]
+
+
+def update_quest_progress(user_id, db_session, quest_type=None, increment=1):
+    """Increment progress on active quests for a user.
+
+    Args:
+        user_id (int): The ID of the user.
+        db_session: Database session.
+        quest_type (str, optional): Filter quests by this type. If ``None`` all
+            active quests will be updated.
+        increment (int): Amount to increment progress by.
+
+    Returns:
+        list: Titles of the quests completed by this update. Their reward XP
+        is added to the user. Nothing is committed.
+    """
+    completed = advance_quests(user_id, db_session, quest_type=quest_type, increment=increment)
+    reward_xp = sum(reward for _, reward in completed)
+    if reward_xp:
+        add_xp(user_id, reward_xp, db_session)
+    return [title for title, _ in completed]
@@ -0,0 +1,148 @@
+"""Request-scoped identity of the current user.
+
+The user id comes from the signed session cookie. The User row is loaded at
+most once per request and kept on ``flask.g``; nothing here writes to the
+database during a request. Immutable fields (id, username, email) can
+optionally be kept in a small in-process cache (``IDENTITY_CACHE_ENABLED``),
+so code that only needs who the user is can skip the query entirely. An entry
+expires ``IDENTITY_CACHE_TTL`` seconds after it was read from the database,
+and is dropped as soon as the ORM changes the user's username or email.
+"""
+from collections import OrderedDict, namedtuple
+import threading
+import time
+
+from flask import current_app, g, session
+
+from study_app import db
+from study_app.models import User
+
+# Until real authentication exists every visitor acts as this user
+DEFAULT_USER_ID = 1
+
+Identity = namedtuple('Identity', ['id', 'username', 'email'])
+
+_identity_cache = OrderedDict()
+_identity_cache_lock = threading.Lock()
+
+
+def init_app(app):
+    """Seed the session identity and make sure the default user exists."""
+    ensure_default_user(app)
+
+    @app.before_request
+    def _seed_session_identity():
+        if 'user_id' not in session:
+            session['user_id'] = DEFAULT_USER_ID
+
+
+def ensure_default_user(app):
+    """Create the default user once at startup, if missing."""
+    with app.app_context():
+        if db.session.get(User, DEFAULT_USER_ID) is None:
+            print(f"Creating default user with ID {DEFAULT_USER_ID} for testing.")
+            db.session.add(User(id=DEFAULT_USER_ID, username='TestUser', email='test@example.com',
+                                level=1, total_xp=0))
+            try:
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error creating default user: {e}")
+
+
+def get_current_user_id():
+    """Return the current user's id from the signed session, without a query."""
+    return session.get('user_id', DEFAULT_USER_ID)
+
+
+def get_current_user():
+    """Return the current User, loading it at most once per request."""
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, get_current_user_id())
+    return g.current_user
+
+
+def get_identity():
+    """
+    Return the immutable fields of the current user.
+
+    Uses the loaded User if this request already has one, then the optional
+    in-process cache, and only then a narrow SELECT.
+
+    Returns:
+        Identity: ``(id, username, email)``, or None if the user does not exist
+    """
+    if 'identity' in g:
+        return g.identity
+    user_id = get_current_user_id()
+    identity = None
+    if g.get('current_user') is not None:
+        user = g.current_user
+        identity = Identity(user.id, user.username, user.email)
+        _cache_put(identity)
+    else:
+        identity = _cache_get(user_id)
+        if identity is None:
+            row = db.session.execute(
+                db.select(User.id, User.username, User.email).where(User.id == user_id)
+            ).first()
+            identity = Identity(*row) if row else None
+            if identity is not None:
+                _cache_put(identity)
+    g.identity = identity
+    return identity
+
+
+def _cache_enabled():
+    return current_app.config.get('IDENTITY_CACHE_ENABLED', False)
+
+
+def _cache_get(user_id):
+    if not _cache_enabled():
+        return None
+    with _identity_cache_lock:
+        entry = _identity_cache.get(user_id)
+        if entry is None:
+            return None
+        identity, expires_at = entry
+        if expires_at < time.monotonic():
+            del _identity_cache[user_id]
+            return None
+        _identity_cache.move_to_end(user_id)
+        return identity
+
+
+def _cache_put(identity):
+    """Cache an identity read from the database. A live entry is kept, so its TTL isn't restarted."""
+    if not _cache_enabled():
+        return
+    ttl = current_app.config.get('IDENTITY_CACHE_TTL', 300)
+    max_size = current_app.config.get('IDENTITY_CACHE_SIZE', 1024)
+    now = time.monotonic()
+    with _identity_cache_lock:
+        entry = _identity_cache.get(identity.id)
+        if entry is not None and entry[1] >= now:
+            return
+        _identity_cache[identity.id] = (identity, now + ttl)
+        _identity_cache.move_to_end(identity.id)
+        while len(_identity_cache) > max_size:
+            _identity_cache.popitem(last=False)
+
+
+def forget_identity(user_id):
+    """Drop a user from the identity cache, e.g. after a username change."""
+    with _identity_cache_lock:
+        _identity_cache.pop(user_id, None)
+
+
+@db.event.listens_for(User, 'after_update')
+def _forget_renamed_user(mapper, connection, target):
+    """Drop the cached identity whenever a flush changes a user's username or email."""
+    state = db.inspect(target)
+    if state.attrs.username.history.has_changes() or state.attrs.email.history.has_changes():
+        forget_identity(target.id)
+
+
+@db.event.listens_for(User, 'after_delete')
+def _forget_deleted_user(mapper, connection, target):
+    forget_identity(target.id)
@@ -0,0 +1,426 @@
+"""Background ingestion queue for uploaded documents.
+
+Jobs are rows in the ``ingestion_job`` table, so the queue survives restarts
+and needs no external broker. Each process runs a small thread pool that
+claims jobs atomically (``UPDATE ... WHERE status='queued'``), which keeps
+several gunicorn workers from processing the same upload twice.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import threading
+import time
+
+from flask import current_app
+
+from study_app import db
+from study_app.models import Document, DocumentChunk, Question, IngestionJob
+from study_app.pdf_processor import stream_pdf_text, iter_chunks
+from study_app.ai_interface import plan_chunk_questions, stream_questions_per_chunk
+from study_app.persistence import question_row, save_question_batch
+from study_app.dedup import screen_questions
+
+# Chunk rows written per INSERT while splitting a document
+CHUNK_INSERT_BATCH = 100
+# Questions reported per poll of a job's event stream
+EVENTS_QUESTION_BATCH = 100
+# Seconds without events before an event stream sends a keep-alive
+EVENTS_KEEPALIVE = 15
+
+_executor = None
+_executor_lock = threading.Lock()
+_resumed = False
+
+
+def init_app(app):
+    """Resume unfinished jobs on the first request served by this process."""
+    @app.before_request
+    def _resume_pending_jobs():
+        global _resumed
+        if _resumed:
+            return
+        _resumed = True
+        resume_pending_jobs(app)
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('INGESTION_WORKERS', 2),
+                thread_name_prefix='ingestion'
+            )
+        return _executor
+
+
+def enqueue_job(app, job_id):
+    """Schedule a job on the local worker pool (or run it inline if disabled)."""
+    if app.config.get('INGESTION_WORKERS', 2) <= 0:
+        run_job(app, job_id)
+        return
+    _get_executor(app).submit(run_job, app, job_id)
+
+
+def resume_pending_jobs(app):
+    """Re-enqueue jobs left behind by a crashed or restarted process."""
+    with app.app_context():
+        cutoff = datetime.utcnow() - timedelta(seconds=app.config.get('INGESTION_STALE_SECONDS', 600))
+        stale = IngestionJob.query.filter(
+            db.or_(
+                IngestionJob.status == 'queued',
+                db.and_(IngestionJob.status == 'running', IngestionJob.updated_at < cutoff)
+            )
+        ).all()
+        job_ids = []
+        for job in stale:
+            # A 'running' job that stopped reporting progress lost its worker
+            job.status = 'queued'
+            job_ids.append(job.id)
+        if stale:
+            db.session.commit()
+    for job_id in job_ids:
+        enqueue_job(app, job_id)
+
+
+def _claim_job(job_id):
+    """Atomically move a job from queued to running. Returns True if claimed."""
+    result = db.session.execute(
+        db.update(IngestionJob)
+        .where(IngestionJob.id == job_id, IngestionJob.status == 'queued')
+        .values(status='running', updated_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _set_stage(job, stage):
+    job.stage = stage
+    db.session.commit()
+
+
+def run_job(app, job_id):
+    """Run all ingestion stages for a job inside an application context."""
+    with app.app_context():
+        if not _claim_job(job_id):
+            return
+        job = db.session.get(IngestionJob, job_id)
+        try:
+            _set_stage(job, 'extract')
+            document = stage_extract(job)
+
+            _set_stage(job, 'generate')
+            question_rows, coverage = stage_generate(job, document)
+
+            _set_stage(job, 'save')
+            stage_save(job, question_rows, coverage)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error running ingestion job {job_id}: {e}")
+            job = db.session.get(IngestionJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def iter_job_events(job_id, last_question_id=0):
+    """
+    Follow a job until it finishes, for ``/jobs/<id>/events``.
+
+    The database is polled every ``JOB_EVENTS_POLL_INTERVAL`` seconds, so the
+    job may be running in any process. Each question saved for the job is
+    reported once, in the order it was saved. After
+    ``JOB_EVENTS_MAX_SECONDS`` the stream ends without a final event, so a
+    slow job doesn't hold a server worker; the browser's ``EventSource``
+    reconnects and resumes from its ``Last-Event-ID``.
+
+    Args:
+        job_id (int): The job to follow
+        last_question_id (int): Resume after this question, e.g. from the
+            ``Last-Event-ID`` of a reconnecting client
+
+    Yields:
+        tuple: ``(event, data, event_id)``. ``event`` is 'status' (stage
+        changes), 'question', then 'done' or 'failed' at the end; 'keep-alive'
+        carries no data and is sent after ``EVENTS_KEEPALIVE`` quiet seconds.
+    """
+    poll = current_app.config.get('JOB_EVENTS_POLL_INTERVAL', 0.25)
+    deadline = time.monotonic() + current_app.config.get('JOB_EVENTS_MAX_SECONDS', 120)
+    last_state = None
+    quiet_since = time.monotonic()
+    while True:
+        job = db.session.get(IngestionJob, job_id, populate_existing=True)
+        if job is None:
+            return
+        sent = False
+        questions = []
+        if job.document_id:
+            # A regenerated document's earlier questions are not part of this job
+            questions = db.session.execute(
+                db.select(Question.id, Question.content, Question.difficulty, Question.xp_value)
+                .where(Question.document_id == job.document_id,
+                       Question.created_at >= job.created_at,
+                       Question.id > last_question_id)
+                .order_by(Question.id)
+                .limit(EVENTS_QUESTION_BATCH)
+            ).all()
+        for question in questions:
+            last_question_id = question.id
+            sent = True
+            yield 'question', {'id': question.id, 'content': question.content,
+                               'difficulty': question.difficulty, 'xp_value': question.xp_value}, question.id
+        if (job.status, job.stage) != last_state:
+            last_state = (job.status, job.stage)
+            sent = True
+            yield 'status', job.to_dict(), None
+
+        finished = job.status in ('done', 'failed')
+        data = job.to_dict()
+        # End the read transaction so the next poll sees new commits
+        db.session.rollback()
+        if finished and len(questions) < EVENTS_QUESTION_BATCH:
+            yield job.status, data, None
+            return
+        if time.monotonic() >= deadline:
+            return
+        if sent:
+            quiet_since = time.monotonic()
+        elif time.monotonic() - quiet_since >= EVENTS_KEEPALIVE:
+            quiet_since = time.monotonic()
+            yield 'keep-alive', None, None
+        if len(questions) < EVENTS_QUESTION_BATCH:
+            time.sleep(poll)
+
+
+def find_source_document(job):
+    """Return the earliest Document storing the same file contents, if any."""
+    if not job.content_hash:
+        return None
+    return (Document.query
+            .filter(Document.content_hash == job.content_hash,
+                    Document.id != job.document_id,
+                    Document.body.has())
+            .order_by(Document.id)
+            .first())
+
+
+def stage_extract(job):
+    """
+    Store the Document row and its chunks, reusing the text of an identical upload if possible.
+
+    An identical file uploaded to the same topic reuses that topic's
+    Document. In another topic the new Document refers to the earlier one's
+    body and chunks instead of copying them. New text is streamed page by
+    page from the PDF into the compressed document body, so memory stays
+    bounded by a few pages. Regeneration jobs (and jobs resumed after this
+    stage) work from the stored document and never re-open the PDF.
+    """
+    if job.document_id:
+        document = db.session.get(Document, job.document_id)
+        if document is None:
+            raise ValueError(f"Document {job.document_id} no longer exists")
+        if not has_chunks(document.text_owner):
+            # Documents stored before chunks were persisted are split on first use
+            store_chunks(document.text_owner)
+            db.session.commit()
+        return document
+
+    source = find_source_document(job)
+    if source is None:
+        document = Document(
+            filename=job.filename,
+            file_path=job.file_path,
+            topic_id=job.topic_id,
+            content_hash=job.content_hash
+        )
+        document.set_content_stream(stream_pdf_text(job.file_path))
+        db.session.add(document)
+        db.session.flush()
+        store_chunks(document)
+    else:
+        if source.topic_id == job.topic_id:
+            document = source
+        else:
+            document = Document(
+                filename=job.filename,
+                file_path=job.file_path,
+                topic_id=job.topic_id,
+                content_hash=job.content_hash,
+                preview=source.preview,
+                text_document_id=source.id
+            )
+            db.session.add(document)
+            db.session.flush()
+        if not has_chunks(source):
+            store_chunks(source)
+    job.document_id = document.id
+    db.session.commit()
+    return document
+
+
+def has_chunks(document):
+    return db.session.scalar(
+        db.select(DocumentChunk.id).where(DocumentChunk.document_id == document.id).limit(1)
+    ) is not None
+
+
+def store_chunks(document):
+    """Split the stored text into DocumentChunk rows, streaming it from the compressed body."""
+    batch = []
+    for position, text in enumerate(iter_chunks(document.iter_content())):
+        batch.append({'document_id': document.id, 'position': position, 'text': text})
+        if len(batch) >= CHUNK_INSERT_BATCH:
+            db.session.execute(db.insert(DocumentChunk), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(DocumentChunk), batch)
+
+
+def backfill_chunks():
+    """
+    Split every stored document that has no chunks yet, committing after each one.
+
+    Documents stored before chunks were persisted are otherwise only split
+    when they are regenerated, and until then search can't find them.
+
+    Returns:
+        int: How many documents were split
+    """
+    unchunked = (db.select(Document.id)
+                 .where(Document.body.has(),
+                        ~db.exists().where(DocumentChunk.document_id == Document.id))
+                 .order_by(Document.id))
+    count = 0
+    for document_id in db.session.scalars(unchunked).all():
+        store_chunks(db.session.get(Document, document_id))
+        db.session.commit()
+        # Release the decompressed text of the documents done so far
+        db.session.expunge_all()
+        count += 1
+    return count
+
+
+def stage_generate(job, document):
+    """
+    Generate questions for the document's least covered chunks.
+
+    Uploads reuse an identical upload's questions if possible; copies are
+    returned for ``stage_save``. Otherwise the model's responses are
+    streamed and parsed questions are saved in small batches
+    (``QUESTION_SAVE_BATCH``), so ``/jobs/<id>/events`` can show them while
+    the rest are still being written. Regeneration always asks the model again, bypassing the
+    response cache.
+
+    Returns:
+        tuple: ``(question_rows, coverage)`` still to be saved, where
+        ``coverage`` lists ``{'chunk_id', 'added'}`` increments for the
+        chunks' question counters
+    """
+    if job.kind == 'upload':
+        earlier = (Question.query
+                   .filter(Question.document_id == document.id, Question.created_at < job.created_at)
+                   .first())
+        if earlier:
+            # An identical file in the same topic: the topic already has its questions
+            return [], []
+        if document.text_document_id:
+            # The shared chunks already count the source's questions
+            source_questions = Question.query.filter_by(document_id=document.text_document_id).all()
+            if source_questions:
+                return [copy_question_row(question, document) for question in source_questions], []
+
+    chunks = db.session.execute(
+        db.select(DocumentChunk.id, DocumentChunk.question_count)
+        .where(DocumentChunk.document_id == document.text_owner.id)
+        .order_by(DocumentChunk.position)
+    ).all()
+    plan = [(chunks[index].id, count)
+            for index, count in plan_chunk_questions([c.question_count for c in chunks], job.num_questions)]
+    # Only the planned chunks' text is loaded
+    texts = dict(db.session.execute(
+        db.select(DocumentChunk.id, DocumentChunk.text)
+        .where(DocumentChunk.id.in_([chunk_id for chunk_id, _ in plan]))
+    ).all())
+    batch_size = current_app.config.get('QUESTION_SAVE_BATCH', 5)
+    interval = current_app.config.get('QUESTION_SAVE_INTERVAL', 1.0)
+    pending = []
+    oldest = None
+    # Request 4 options per question (1 correct, 3 distractors)
+    results = stream_questions_per_chunk([(texts[chunk_id], count) for chunk_id, count in plan],
+                                         num_options=4, use_cache=job.kind != 'regenerate')
+    for index, q_data in results:
+        row = question_row(q_data, job.topic_id, document.id)
+        if row is None:
+            print(f"Skipping question due to missing data: {q_data.get('question', 'N/A')}")
+            continue
+        if not pending:
+            oldest = time.monotonic()
+        pending.append((row, plan[index][0]))
+        if len(pending) >= batch_size or time.monotonic() - oldest >= interval:
+            save_generated_questions(job, pending)
+            pending = []
+    if pending:
+        save_generated_questions(job, pending)
+    return [], []
+
+
+def save_generated_questions(job, pending):
+    """
+    Save a batch of generated ``(row, chunk_id)`` pairs with their chunk counters and commit.
+
+    Near-duplicates are dropped but still count towards their chunk's
+    coverage, as in ``stage_save``.
+    """
+    rows = [row for row, _ in pending]
+    screened = screen_questions(job.topic_id, rows)
+    add_coverage([{'chunk_id': chunk_id, 'added': added}
+                  for chunk_id, added in Counter(chunk_id for _, chunk_id in pending).items()])
+    job.questions_created = (job.questions_created or 0) + sum(fp is not None for fp in screened)
+    save_question_batch([row for row, fp in zip(rows, screened) if fp is not None],
+                        fingerprints=[fp for fp in screened if fp is not None])
+
+
+def add_coverage(coverage):
+    """Increment chunk question counters by ``{'chunk_id', 'added'}`` entries. Nothing is committed."""
+    chunk = DocumentChunk.__table__
+    db.session.execute(
+        chunk.update()
+        .where(chunk.c.id == db.bindparam('chunk_id'))
+        .values(question_count=chunk.c.question_count + db.bindparam('added')),
+        list(coverage)
+    )
+
+
+def copy_question_row(question, document):
+    """Build a row copying a question generated for an identical document."""
+    return {
+        'content': question.content,
+        'options': question.options,
+        'answer': question.answer,
+        'explanation': question.explanation,
+        'difficulty': question.difficulty,
+        'xp_value': question.xp_value,
+        'topic_id': document.topic_id,
+        'document_id': document.id,
+    }
+
+
+def stage_save(job, question_rows, coverage=()):
+    """
+    Write the remaining questions, chunk counters and the job result in one transaction.
+
+    Near-duplicates of the topic's existing questions (or of each other) are
+    dropped. They still count towards their chunk's coverage, so regeneration
+    moves on to other parts of the document.
+    """
+    screened = screen_questions(job.topic_id, question_rows)
+    question_rows = [row for row, fp in zip(question_rows, screened) if fp is not None]
+    fingerprints = [fp for fp in screened if fp is not None]
+    job.questions_created = (job.questions_created or 0) + len(question_rows)
+    job.stage = 'done'
+    job.status = 'done'
+    if coverage:
+        add_coverage(coverage)
+    save_question_batch(question_rows, fingerprints=fingerprints)
@@ -1,10 +1,14 @@
 from datetime import datetime
 from study_app import db
-# Import JSON type if using PostgreSQL or similar, otherwise use Text
-from sqlalchemy.dialects.postgresql import JSONB 
-# Or for SQLite/MySQL, use Text and handle JSON manually:
-from sqlalchemy import Text 
+# JSONB is used for Question.options on PostgreSQL
+from sqlalchemy.dialects.postgresql import JSONB
 import json
+import codecs
+import random
+import zlib
+
+# Characters of extracted text stored on Document for listings
+PREVIEW_LENGTH = 200
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -31,6 +35,9 @@ class User(db.Model):
         return False
 
 class Topic(db.Model):
+    __table_args__ = (
+        db.Index('ix_topic_user_id', 'user_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
@@ -38,61 +45,234 @@ class Topic(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     documents = db.relationship('Document', backref='topic', lazy=True)
     questions = db.relationship('Question', backref='topic', lazy=True)
+    # Populated by queries.topic_summaries() with aggregate counts
+    document_count = db.query_expression()
+    question_count = db.query_expression()
     
     def __repr__(self):
         return f'<Topic {self.title}>'
 
 class Document(db.Model):
+    __table_args__ = (
+        db.Index('ix_document_topic_id', 'topic_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(255), nullable=False)
     topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'), nullable=False)
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
-    content = db.Column(db.Text)  # Extracted text content from the document
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the uploaded file
+    preview = db.Column(db.String(PREVIEW_LENGTH))  # Start of the text, for listings
+    # The full extracted text lives compressed in DocumentContent and is only
+    # loaded when ``content`` is accessed
+    body = db.relationship('DocumentContent', uselist=False, lazy='select',
+                           cascade='all, delete-orphan')
+    # An identical upload in another topic shares the earlier document's body
+    # and chunks instead of storing its own
+    text_document_id = db.Column(db.Integer, db.ForeignKey('document.id'), index=True)
+    text_source = db.relationship('Document', remote_side=[id], lazy='select')
+
+    @property
+    def text_owner(self):
+        """The document holding this document's body and chunks."""
+        return self.text_source if self.text_document_id else self
+
+    @property
+    def content(self):
+        """Extracted text content from the document."""
+        body = self.text_owner.body
+        return body.text if body is not None else None
+
+    @content.setter
+    def content(self, text):
+        if text is None:
+            self.body = None
+            self.preview = None
+            return
+        self.body = DocumentContent.from_text(text)
+        self.preview = make_preview(text)
+
+    def set_content_stream(self, pieces):
+        """Compress streamed text (e.g. page by page) without joining it."""
+        head = []
+        head_length = 0
+
+        def capture_head():
+            nonlocal head_length
+            for piece in pieces:
+                if head_length < PREVIEW_LENGTH * 2:
+                    head.append(piece[:PREVIEW_LENGTH * 2])
+                    head_length += len(head[-1])
+                yield piece
+
+        self.body = DocumentContent.from_pieces(capture_head())
+        self.preview = make_preview(''.join(head))
+
+    def iter_content(self):
+        """Yield the extracted text in pieces, decompressing as it goes."""
+        body = self.text_owner.body
+        if body is not None:
+            yield from body.iter_text()
     
     def __repr__(self):
         return f'<Document {self.filename}>'
 
+
+def make_preview(text, length=PREVIEW_LENGTH):
+    """Collapse whitespace and cut ``text`` to ``length`` characters."""
+    return ' '.join(text[:length * 2].split())[:length]
+
+
+class DocumentContent(db.Model):
+    """zlib-compressed full text of a Document, kept out of the document row."""
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer, nullable=False)  # Uncompressed UTF-8 bytes
+
+    @classmethod
+    def from_text(cls, text):
+        raw = text.encode('utf-8')
+        return cls(data=zlib.compress(raw, 6), size=len(raw))
+
+    @classmethod
+    def from_pieces(cls, pieces):
+        compressor = zlib.compressobj(6)
+        compressed = []
+        size = 0
+        for piece in pieces:
+            raw = piece.encode('utf-8')
+            size += len(raw)
+            compressed.append(compressor.compress(raw))
+        compressed.append(compressor.flush())
+        return cls(data=b''.join(compressed), size=size)
+
+    @property
+    def text(self):
+        return zlib.decompress(self.data).decode('utf-8')
+
+    def iter_text(self, block_size=16 * 1024):
+        """Yield the text in pieces, decompressing ``block_size`` bytes at a time."""
+        decompressor = zlib.decompressobj()
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        data = memoryview(self.data)
+        for offset in range(0, len(data), block_size):
+            text = decoder.decode(decompressor.decompress(data[offset:offset + block_size]))
+            if text:
+                yield text
+        tail = decoder.decode(decompressor.flush(), final=True)
+        if tail:
+            yield tail
+
+    def __repr__(self):
+        return f'<DocumentContent {self.document_id} {len(self.data)}/{self.size} bytes>'
+
+
+class DocumentChunk(db.Model):
+    """A slice of a document's text that questions are generated from."""
+    __table_args__ = (
+        db.UniqueConstraint('document_id', 'position', name='uq_document_chunk_document_id_position'),
+        # Regeneration picks the chunks with the fewest questions first
+        db.Index('ix_document_chunk_document_id_question_count', 'document_id', 'question_count'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # 0-based order within the document
+    text = db.Column(db.Text, nullable=False)
+    question_count = db.Column(db.Integer, nullable=False, default=0)  # Questions generated from this chunk
+
+    def __repr__(self):
+        return f'<DocumentChunk {self.document_id}:{self.position} ({self.question_count} questions)>'
+
 class Question(db.Model):
+    __table_args__ = (
+        # Training and battle select a topic's questions ordered by difficulty
+        db.Index('ix_question_topic_id_difficulty', 'topic_id', 'difficulty'),
+        # Battles sample a difficulty bucket in random_key order from a random pivot
+        db.Index('ix_question_topic_id_difficulty_random_key', 'topic_id', 'difficulty', 'random_key'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
-    # Store options as JSON or Text. Using Text for broader compatibility.
-    # If using PostgreSQL, JSONB is generally preferred:
-    # options = db.Column(JSONB) 
-    options = db.Column(Text) # Store options as a JSON string
+    # Store options natively as JSON: JSONB on PostgreSQL, JSON elsewhere.
+    # Rows are deserialized once when loaded rather than on every access.
+    options = db.Column(db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql'))
     answer = db.Column(db.Text, nullable=False) # This will store the TEXT of the correct option
     explanation = db.Column(db.Text)
     difficulty = db.Column(db.Integer, default=1)  # 1-5 scale
     xp_value = db.Column(db.Integer, nullable=False, default=10)  # Experience points awarded for correct answer
     topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'), nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), index=True)  # Source document, if any
+    random_key = db.Column(db.Float, default=random.random)  # Uniform in [0, 1), see sampling.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_responses = db.relationship('UserResponse', backref='question', lazy=True)
     
     # Helper property to get options as a list
     @property
     def options_list(self):
-        if self.options:
-            try:
-                return json.loads(self.options)
-            except json.JSONDecodeError:
-                return [] # Return empty list if JSON is invalid
-        return []
+        options = self.options
+        if isinstance(options, list):
+            return options
+        if not options:
+            return []
+        # Legacy rows may hold a JSON-encoded string; parse it once per loaded value
+        cached = self.__dict__.get('_options_cache')
+        if cached is not None and cached[0] is options:
+            return cached[1]
+        try:
+            parsed = json.loads(options)
+        except (TypeError, json.JSONDecodeError):
+            parsed = []  # Return empty list if JSON is invalid
+        if not isinstance(parsed, list):
+            parsed = []
+        self._options_cache = (options, parsed)
+        return parsed
 
     # Helper property to set options from a list
     @options_list.setter
     def options_list(self, value):
         if isinstance(value, list):
-            self.options = json.dumps(value)
+            self.__dict__.pop('_options_cache', None)
+            self.options = value
         else:
             raise ValueError("Options must be a list")
             
     def __repr__(self):
         return f'<Question {self.id}>'
 
+
+class QuestionSignature(db.Model):
+    """MinHash signature of a question, see dedup.py."""
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), primary_key=True)
+    topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'), nullable=False, index=True)
+    minhash = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f'<QuestionSignature {self.question_id}>'
+
+
+class QuestionBucket(db.Model):
+    """One LSH band of a question's signature; questions sharing a bucket are duplicate candidates."""
+    __table_args__ = (
+        # New questions look up their buckets within the topic
+        db.Index('ix_question_bucket_topic_id_bucket', 'topic_id', 'bucket'),
+    )
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), primary_key=True)
+    bucket = db.Column(db.BigInteger, primary_key=True, autoincrement=False)  # Hash of (band, band values)
+    topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'), nullable=False)
+
+    def __repr__(self):
+        return f'<QuestionBucket {self.question_id} {self.bucket}>'
+
 class UserResponse(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_response_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_user_response_question_id', 'question_id'),
+        # Adaptive training reads a user's latest answers on one topic
+        db.Index('ix_user_response_user_id_topic_id_created_at', 'user_id', 'topic_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
+    topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'))  # Copied from the question
     response_text = db.Column(db.Text)
     is_correct = db.Column(db.Boolean, default=False)
     response_time = db.Column(db.Float)  # Time taken to answer in seconds
@@ -102,6 +282,11 @@ class UserResponse(db.Model):
         return f'<UserResponse {self.id}>'
 
 class Battle(db.Model):
+    __table_args__ = (
+        # Profile lists a user's battles newest first
+        db.Index('ix_battle_user_id_started_at', 'user_id', 'started_at'),
+        db.Index('ix_battle_topic_id', 'topic_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'), nullable=False)
@@ -116,6 +301,10 @@ class Battle(db.Model):
 
 
 class Quest(db.Model):
+    __table_args__ = (
+        # update_quest_progress filters active quests of a user by type
+        db.Index('ix_quest_user_id_completed_quest_type', 'user_id', 'completed', 'quest_type'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(100), nullable=False)
@@ -129,3 +318,88 @@ class Quest(db.Model):
 
     def __repr__(self):
         return f'<Quest {self.title}>'
+
+
+class IngestionJob(db.Model):
+    """A queued upload or regeneration moving through extract -> generate -> save stages."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'), nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'))
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64))
+    num_questions = db.Column(db.Integer, nullable=False, default=5)
+    kind = db.Column(db.String(20), nullable=False, default='upload', server_default='upload')  # upload, regenerate
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    stage = db.Column(db.String(20), default='queued')  # queued, extract, generate, save, done
+    questions_created = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'stage': self.stage,
+            'topic_id': self.topic_id,
+            'document_id': self.document_id,
+            'questions_created': self.questions_created,
+            'error': self.error,
+        }
+
+    def __repr__(self):
+        return f'<IngestionJob {self.id} {self.status}>'
+
+
+class UserStats(db.Model):
+    """Per-user answer statistics, maintained incrementally by submit_answer."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_responses = db.Column(db.Integer, nullable=False, default=0)
+    correct_responses = db.Column(db.Integer, nullable=False, default=0)
+    current_streak = db.Column(db.Integer, nullable=False, default=0)  # Consecutive active days
+    longest_streak = db.Column(db.Integer, nullable=False, default=0)
+    last_active_date = db.Column(db.Date)
+
+    @property
+    def knowledge_rate(self):
+        """Percentage of correct answers."""
+        if not self.total_responses:
+            return 0
+        return round(100 * self.correct_responses / self.total_responses)
+
+    def __repr__(self):
+        return f'<UserStats {self.user_id}>'
+
+
+class UserTopicStats(db.Model):
+    """Per-user, per-topic answer statistics."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    topic_id = db.Column(db.Integer, db.ForeignKey('topic.id'), primary_key=True)
+    total_responses = db.Column(db.Integer, nullable=False, default=0)
+    correct_responses = db.Column(db.Integer, nullable=False, default=0)
+    total_response_time = db.Column(db.Float, nullable=False, default=0.0)
+    last_answered_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<UserTopicStats {self.user_id}/{self.topic_id}>'
+
+
+class ReviewState(db.Model):
+    """SM-2 spaced-repetition schedule of one question for one user."""
+    __table_args__ = (
+        # Review mode pulls a user's earliest due items
+        db.Index('ix_review_state_user_id_due_at', 'user_id', 'due_at'),
+    )
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), primary_key=True)
+    repetitions = db.Column(db.Integer, nullable=False, default=0)  # Successful reviews in a row
+    interval_days = db.Column(db.Integer, nullable=False, default=0)
+    ease = db.Column(db.Float, nullable=False, default=2.5)
+    due_at = db.Column(db.DateTime, nullable=False)
+    last_reviewed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ReviewState {self.user_id}/{self.question_id} due {self.due_at}>'
@@ -1,91 +1,331 @@
 import PyPDF2
 import os
 import re
-from flask import current_app
+from collections import deque
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, has_app_context
 
-def process_pdf_file(file_path):
+def extract_text_from_pdf(file_path, workers=None):
     """
-    Extract text from a PDF file.
+    Extract text content from a PDF file.
     
     Args:
         file_path (str): Path to the PDF file
+        workers (int, optional): Number of worker processes, see ``iter_page_texts``
         
     Returns:
-        str: Extracted text content from the PDF
+        str: Raw extracted text
     """
     try:
-        extracted_text = extract_text_from_pdf(file_path)
-        processed_text = clean_and_chunk_text(extracted_text)
-        return processed_text
+        # Join once instead of repeated concatenation
+        return "".join(text + "\n\n" for text in iter_page_texts(file_path, workers))
     except Exception as e:
-        print(f"Error processing PDF: {str(e)}")
-        return "Error extracting text from PDF. Please ensure the file is not corrupted or password protected."
+        print(f"Error extracting text from PDF: {str(e)}")
+        raise
 
-def extract_text_from_pdf(file_path):
+def iter_page_texts(file_path, workers=None):
     """
-    Extract text content from a PDF file.
+    Yield the non-empty page texts of a PDF in page order.
+    
+    Only a bounded number of pages is held at a time. Large documents are
+    extracted in batches of ``PDF_PAGE_BATCH`` pages by separate processes,
+    each opening its own ``PdfReader``, with at most two batches per worker
+    in flight. The workers are spawned rather than forked.
     
     Args:
         file_path (str): Path to the PDF file
+        workers (int, optional): Number of worker processes. Defaults to
+            ``PDF_EXTRACT_WORKERS`` from the app config.
         
-    Returns:
-        str: Raw extracted text
+    Yields:
+        str: Raw text of each page that has any
     """
-    text = ""
+    if workers is None:
+        workers = _config_value('PDF_EXTRACT_WORKERS', 1)
+    min_pages = _config_value('PDF_PARALLEL_MIN_PAGES', 50)
+    batch = _config_value('PDF_PAGE_BATCH', 32)
     
-    try:
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            num_pages = len(reader.pages)
-            
-            for page_num in range(num_pages):
-                page = reader.pages[page_num]
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        num_pages = len(reader.pages)
+        if workers <= 1 or num_pages < min_pages:
+            for page in reader.pages:
                 page_text = page.extract_text()
                 if page_text:
-                    text += page_text + "\n\n"
-        
-        return text
-    except Exception as e:
-        print(f"Error extracting text from PDF: {str(e)}")
-        raise
+                    yield page_text
+            return
+    
+    # Ingestion runs on worker threads, and forking a multithreaded process
+    # can deadlock the child on a lock held by another thread
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        in_flight = deque()
+        for start in range(0, num_pages, batch):
+            in_flight.append(executor.submit(_extract_page_range, file_path, start, min(start + batch, num_pages)))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+def _extract_page_range(file_path, start, stop):
+    """Extract the non-empty page texts for pages ``start`` to ``stop - 1``."""
+    page_texts = []
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        for page_num in range(start, stop):
+            page_text = reader.pages[page_num].extract_text()
+            if page_text:
+                page_texts.append(page_text)
+    return page_texts
+
+def _config_value(key, default):
+    """Read a config value when running inside the app, else use the default."""
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+# Characters per token for English text, the usual rule of thumb for Gemini models
+CHARS_PER_TOKEN = 4
 
-def clean_and_chunk_text(text, max_chunk_size=8000):
+# One table for every character cleanup: odd spaces become plain spaces,
+# line and paragraph separators become newlines, ligatures are expanded and
+# soft hyphens, zero-width and control characters are dropped
+_CLEAN_TABLE = str.maketrans({
+    **{code: ' ' for code in (0x09, 0x0b, 0x0c, 0xa0, 0x1680, 0x202f, 0x205f, 0x3000)},
+    **{code: ' ' for code in range(0x2000, 0x200b)},
+    **{code: '\n' for code in (0x0d, 0x85, 0x2028, 0x2029)},
+    **{code: None for code in (*range(0x00, 0x09), *range(0x0e, 0x20), 0x7f, 0xad, 0x200b, 0x200c, 0x200d, 0x2060, 0xfeff)},
+    0xfb00: 'ff', 0xfb01: 'fi', 0xfb02: 'fl', 0xfb03: 'ffi', 0xfb04: 'ffl', 0xfb05: 'st', 0xfb06: 'st',
+})
+# str.translate looks up every character of non-ASCII text in the table, so
+# such text only has the table's characters substituted, found in one scan
+_CLEAN_CHARS = re.compile('[' + re.escape(''.join(chr(code) for code in _CLEAN_TABLE)) + ']')
+# A blank line (possibly holding spaces) separates paragraphs
+_PARAGRAPH_BREAK = re.compile(r'\n[ ]*\n\s*')
+# End of a sentence: terminal punctuation and at most one closing quote or
+# bracket, followed by a space and something that can start a sentence.
+# Initials and abbreviations like "e.g." or "U.S." are not sentence ends.
+_SENTENCE_END = re.compile(r'[.!?](?<!\b\w[.!?])["\'\u201d\u2019)\]]?(?= ["\'\u201c\u2018(\[]?[A-Z0-9])')
+
+def _translate_char(match):
+    return _CLEAN_TABLE[ord(match.group())] or ''
+
+def clean_text(text):
     """
-    Clean and chunk text to prepare for AI processing.
+    Clean raw extracted text to prepare for AI processing.
+    
+    Characters are normalized in one pass over ``_CLEAN_TABLE``, whitespace
+    runs inside a paragraph become single spaces and paragraphs are
+    separated by a blank line. Letters and digits are left as extracted.
     
     Args:
         text (str): Raw extracted text from PDF
-        max_chunk_size (int): Maximum size for each text chunk
         
     Returns:
-        str: Cleaned and processed text
-    """
-    # Basic cleaning
-    # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
-    # Fix common OCR issues
-    text = text.replace('|', 'I').replace('1', 'l')
-    
-    # If text is too long, chunk it (for large documents)
-    if len(text) > max_chunk_size:
-        # This is a simple chunking method - more sophisticated methods could be used
-        chunks = []
+        str: Cleaned text
+    """
+    if text.isascii():
+        text = text.translate(_CLEAN_TABLE)
+    else:
+        text = _CLEAN_CHARS.sub(_translate_char, text)
+    paragraphs = (" ".join(paragraph.split()) for paragraph in _PARAGRAPH_BREAK.split(text))
+    return "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
+
+def iter_clean_text(page_texts):
+    """
+    Clean page texts one at a time, as ``clean_text`` would clean their join.
+    
+    Args:
+        page_texts (iterable): Raw page texts, e.g. from ``iter_page_texts``
+        
+    Yields:
+        str: Cleaned pieces whose concatenation equals ``clean_text`` of the
+        pages joined with spaces; a page break rarely ends a paragraph
+    """
+    separator = ""
+    for page_text in page_texts:
+        piece = clean_text(page_text)
+        if piece:
+            yield separator + piece
+            separator = " "
+
+def stream_pdf_text(file_path, workers=None):
+    """Yield the cleaned text of a PDF page by page."""
+    return iter_clean_text(iter_page_texts(file_path, workers))
+
+def estimate_tokens(text):
+    """Estimate how many model tokens ``text`` takes, rounding up."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def iter_sentences(pieces):
+    """
+    Split streamed cleaned text into sentences.
+    
+    Only the unfinished sentence is buffered between pieces, so paragraphs
+    and sentences may span page breaks.
+    
+    Args:
+        pieces (iterable): Cleaned text pieces, e.g. from ``iter_clean_text``
+        
+    Yields:
+        tuple: ``(sentence, ends_paragraph)``
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        *paragraphs, buffer = buffer.split("\n\n")
+        for paragraph in paragraphs:
+            yield from _paragraph_sentences(paragraph)
+        # The paragraph's last sentence may continue in the next piece
         start = 0
+        for match in _SENTENCE_END.finditer(buffer):
+            sentence = buffer[start:match.end()].strip()
+            if sentence:
+                yield sentence, False
+            start = match.end() + 1
+        buffer = buffer[start:]
+    yield from _paragraph_sentences(buffer)
+
+def _paragraph_sentences(paragraph):
+    """Yield ``(sentence, ends_paragraph)`` for the sentences of a whole paragraph."""
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(paragraph):
+        sentences.append(paragraph[start:match.end()].strip())
+        start = match.end() + 1
+    sentences.append(paragraph[start:].strip())
+    sentences = [sentence for sentence in sentences if sentence]
+    for sentence in sentences[:-1]:
+        yield sentence, False
+    if sentences:
+        yield sentences[-1], True
+
+def _split_long_sentence(sentence, max_chars):
+    """Cut a sentence longer than ``max_chars`` at word boundaries (or mid-word if it must)."""
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(' ', 0, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        yield sentence[:cut]
+        sentence = sentence[cut:].lstrip()
+    if sentence:
+        yield sentence
+
+def iter_chunks(pieces, max_tokens=None, overlap_tokens=None):
+    """
+    Pack streamed text into chunks of whole sentences within a token budget.
+    
+    Chunks are yielded as soon as they are full, so no more than about one
+    chunk is held at a time. A chunk preferably ends at a paragraph break
+    when one falls in its second half. Each chunk after the first starts
+    with the last sentences of the previous one, up to ``overlap_tokens``,
+    so a fact cut by a chunk boundary still appears whole in one of them.
+    Sentences longer than the budget are cut at word boundaries.
+    
+    Args:
+        pieces (iterable): Cleaned text pieces, e.g. from ``iter_clean_text``
+        max_tokens (int, optional): Token budget per chunk. Defaults to
+            ``QUESTION_CHUNK_TOKENS`` from the app config.
+        overlap_tokens (int, optional): Tokens repeated from the previous
+            chunk, at most half the budget. Defaults to
+            ``QUESTION_CHUNK_OVERLAP_TOKENS`` from the app config.
         
-        while start < len(text):
-            # Find a good break point (end of sentence)
-            end = min(start + max_chunk_size, len(text))
-            if end < len(text):
-                # Try to find a sentence break
-                sentence_end = text.rfind('.', start, end)
-                if sentence_end > start + max_chunk_size // 2:  # Only use if we found a reasonable break
-                    end = sentence_end + 1
-            
-            chunks.append(text[start:end])
-            start = end
+    Yields:
+        str: Text chunks; sentences are joined with spaces and paragraphs
+        with blank lines
+    """
+    if max_tokens is None:
+        max_tokens = _config_value('QUESTION_CHUNK_TOKENS', 2000)
+    if overlap_tokens is None:
+        overlap_tokens = _config_value('QUESTION_CHUNK_OVERLAP_TOKENS', 0)
+    max_tokens = max(2, max_tokens)
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+    # Longest sentence that fits the budget with its separator
+    max_chars = (max_tokens - 1) * CHARS_PER_TOKEN
+    
+    # (sentence, ends_paragraph, tokens) units of the chunk being filled
+    current = []
+    total = 0
+    # Whether ``current`` holds text beyond the overlap from the previous chunk
+    fresh = False
+    for sentence, ends_paragraph in iter_sentences(pieces):
+        parts = [sentence] if len(sentence) <= max_chars else list(_split_long_sentence(sentence, max_chars))
+        for index, part in enumerate(parts):
+            # One token more for the separator that follows the sentence
+            unit = (part, ends_paragraph and index == len(parts) - 1, estimate_tokens(part) + 1)
+            if fresh and total + unit[2] > max_tokens:
+                end = _chunk_end(current, unit[2], max_tokens)
+                yield _join_sentences(current[:end])
+                rest = current[end:]
+                overlap = []
+                overlap_total = 0
+                for previous in reversed(current[:end]):
+                    if overlap_total + previous[2] > overlap_tokens:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_total += previous[2]
+                current = overlap + rest
+                total = sum(tokens for _, _, tokens in current)
+                fresh = bool(rest)
+            # Shed overlap from the front until the new sentence fits
+            while current and total + unit[2] > max_tokens:
+                total -= current.pop(0)[2]
+            current.append(unit)
+            total += unit[2]
+            fresh = True
+    if fresh:
+        yield _join_sentences(current)
+
+def _chunk_end(units, incoming, max_tokens):
+    """
+    Pick how many of ``units`` make up the next chunk.
+    
+    The chunk ends at the last paragraph break in its second half, as long
+    as the sentences after it and ``incoming`` tokens fit in the next chunk;
+    otherwise it takes every unit.
+    """
+    end = len(units)
+    running = 0
+    total = sum(tokens for _, _, tokens in units)
+    for position, (_, ends_paragraph, tokens) in enumerate(units[:-1], 1):
+        running += tokens
+        if ends_paragraph and running >= max_tokens // 2 and total - running + incoming <= max_tokens:
+            end = position
+    return end
+
+def _join_sentences(units):
+    """Join ``(sentence, ends_paragraph, tokens)`` units back into text."""
+    parts = []
+    for index, (sentence, ends_paragraph, _) in enumerate(units):
+        parts.append(sentence)
+        if index < len(units) - 1:
+            parts.append("\n\n" if ends_paragraph else " ")
+    return "".join(parts)
+
+def chunk_text(text, max_tokens=None, overlap_tokens=None):
+    """
+    Split cleaned text into chunks; see ``iter_chunks``.
+    
+    Args:
+        text (str): Cleaned text
+        max_tokens (int, optional): Token budget per chunk
+        overlap_tokens (int, optional): Tokens repeated from the previous chunk
         
-        # For simplicity in this example, we're just taking the first chunk
-        # In a real application, you might want to process all chunks or find a better way to summarize
-        return chunks[0]
+    Returns:
+        list: Text chunks
+    """
+    return list(iter_chunks([text], max_tokens, overlap_tokens))
+
+def clean_and_chunk_text(text, max_tokens=None, overlap_tokens=None):
+    """
+    Clean and chunk text to prepare for AI processing.
     
-    return text
+    Args:
+        text (str): Raw extracted text from PDF
+        max_tokens (int, optional): Token budget per chunk
+        overlap_tokens (int, optional): Tokens repeated from the previous chunk
+        
+    Returns:
+        list: Cleaned text chunks covering the whole document
+    """
+    return chunk_text(clean_text(text), max_tokens, overlap_tokens)
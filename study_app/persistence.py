@@ -0,0 +1,126 @@
+"""Bulk persistence helpers for generated content.
+
+These write whole batches with a single multi-row ``INSERT ... RETURNING``
+per table instead of adding ORM objects one at a time.
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+
+from study_app import db
+from study_app.dedup import index_questions
+from study_app.models import Question, Quest
+
+REQUIRED_QUESTION_KEYS = ("question", "options", "answer", "explanation", "difficulty")
+
+
+def question_row(q_data, topic_id, document_id=None):
+    """
+    Convert a generated question dictionary into a ``question`` table row.
+
+    Args:
+        q_data (dict): Question as returned by ``generate_questions``
+        topic_id (int): Topic the question belongs to
+        document_id (int, optional): Source document
+
+    Returns:
+        dict: Column values, or None if required keys are missing
+    """
+    if not all(k in q_data for k in REQUIRED_QUESTION_KEYS):
+        return None
+    if not isinstance(q_data['options'], list):
+        return None
+    return {
+        'content': q_data['question'],
+        'options': q_data['options'],
+        'answer': q_data['answer'],
+        'explanation': q_data['explanation'],
+        'difficulty': q_data['difficulty'],
+        'topic_id': topic_id,
+        'document_id': document_id,
+    }
+
+
+def default_quest_rows(user_id, topic_title):
+    """Return rows for the default training and battle quests of a topic."""
+    return [
+        {
+            'user_id': user_id,
+            'title': f"Study {topic_title}",
+            'description': "Answer 5 training questions from this topic",
+            'target': 5,
+            'quest_type': 'training',
+            'reward_xp': 50,
+        },
+        {
+            'user_id': user_id,
+            'title': f"Defeat the {topic_title} Boss",
+            'description': "Answer 5 battle questions correctly",
+            'target': 5,
+            'quest_type': 'battle',
+            'reward_xp': 75,
+        },
+    ]
+
+
+def bulk_insert(model, rows):
+    """
+    Insert rows for ``model`` in one statement without committing.
+
+    Args:
+        model: The model class to insert into
+        rows (list): Column value dictionaries
+
+    Returns:
+        list: Primary keys of the inserted rows, in order
+    """
+    if not rows:
+        return []
+    return list(db.session.scalars(
+        db.insert(model).returning(model.id, sort_by_parameter_order=True),
+        rows
+    ))
+
+
+def save_question_batch(question_rows, quest_rows=(), fingerprints=None):
+    """
+    Write a batch of questions and quests in a single transaction.
+
+    Args:
+        question_rows (list): Rows built with ``question_row``
+        quest_rows (list): Rows built with ``default_quest_rows``
+        fingerprints (list, optional): ``dedup.Fingerprint`` of each question,
+            in the same order, indexed for near-duplicate detection
+
+    Returns:
+        tuple: ``(question_ids, quest_ids)``
+    """
+    question_rows = list(question_rows)
+    try:
+        question_ids = bulk_insert(Question, question_rows)
+        quest_ids = bulk_insert(Quest, list(quest_rows))
+        if fingerprints is not None:
+            index_questions(zip(question_ids, (row['topic_id'] for row in question_rows), fingerprints))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return question_ids, quest_ids
+
+
+def upsert(model, values, index_elements, set_):
+    """
+    Build an ``INSERT ... ON CONFLICT DO UPDATE`` for SQLite or PostgreSQL.
+
+    Args:
+        model: The model class to insert into
+        values (dict or list): Row(s) to insert
+        index_elements (list): Columns of the conflicting unique key
+        set_ (callable): Called with the ``excluded`` pseudo-table and returns
+            the column values to set on conflict
+
+    Returns:
+        The insert statement, ready to execute
+    """
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    stmt = insert(model).values(values)
+    return stmt.on_conflict_do_update(index_elements=index_elements, set_=set_(stmt.excluded))
@@ -0,0 +1,115 @@
+"""Read queries shared by the page routes."""
+from sqlalchemy.orm import with_expression, load_only
+
+from study_app import db
+from study_app.game_logic import recent_answers
+from study_app.models import Topic, Document, Question
+
+
+def topic_summaries(user_id=None, topic_id=None):
+    """
+    Load topics with their document and question counts in one query.
+
+    Counts come from GROUP BY subqueries joined to the topics, so no
+    Document or Question rows are loaded.
+
+    Args:
+        user_id (int, optional): Only topics owned by this user
+        topic_id (int, optional): Only this topic
+
+    Returns:
+        list: Topic objects with ``document_count`` and ``question_count`` set
+    """
+    doc_counts = _count_by_topic(Document, user_id, topic_id)
+    question_counts = _count_by_topic(Question, user_id, topic_id)
+
+    stmt = (
+        db.select(Topic)
+        .outerjoin(doc_counts, doc_counts.c.topic_id == Topic.id)
+        .outerjoin(question_counts, question_counts.c.topic_id == Topic.id)
+        .options(
+            with_expression(Topic.document_count, db.func.coalesce(doc_counts.c.n, 0)),
+            with_expression(Topic.question_count, db.func.coalesce(question_counts.c.n, 0)),
+        )
+        .order_by(Topic.id)
+    )
+    if user_id is not None:
+        stmt = stmt.where(Topic.user_id == user_id)
+    if topic_id is not None:
+        stmt = stmt.where(Topic.id == topic_id)
+    return list(db.session.scalars(stmt))
+
+
+def _count_by_topic(model, user_id, topic_id):
+    """Subquery of ``(topic_id, n)`` row counts of ``model`` per topic."""
+    stmt = db.select(model.topic_id, db.func.count().label('n'))
+    if user_id is not None:
+        stmt = stmt.join(Topic, Topic.id == model.topic_id).where(Topic.user_id == user_id)
+    if topic_id is not None:
+        stmt = stmt.where(model.topic_id == topic_id)
+    return stmt.group_by(model.topic_id).subquery()
+
+
+def topic_documents(topic_id):
+    """
+    List a topic's documents without loading their full text.
+
+    Returns:
+        list: Rows with ``id``, ``filename``, ``upload_date`` and ``preview``
+    """
+    return db.session.execute(
+        db.select(Document.id, Document.filename, Document.upload_date, Document.preview)
+        .where(Document.topic_id == topic_id)
+        .order_by(Document.id)
+    ).all()
+
+
+def topic_questions(topic_id):
+    """List a topic's questions for display, without their responses."""
+    return list(db.session.scalars(
+        db.select(Question)
+        .where(Question.topic_id == topic_id)
+        .options(load_only(Question.id, Question.content, Question.answer, Question.explanation,
+                           Question.difficulty, Question.xp_value))
+        .order_by(Question.id)
+    ))
+
+
+def next_training_question(user_id, topic_id, difficulty, window=20):
+    """
+    Pick the next training question from a topic's difficulty buckets.
+
+    Buckets are tried nearest first (``difficulty``, then one level harder,
+    one easier, ...). Each try is a range probe of the (topic_id, difficulty)
+    index that skips questions among the user's last ``window`` answers. If
+    every question was answered recently, the exclusion is dropped.
+
+    Args:
+        user_id (int): The ID of the user
+        topic_id (int): The topic being trained
+        difficulty (int): Target difficulty (1-5)
+        window (int): How many recent answers count as "recently seen"
+
+    Returns:
+        Question: The chosen question, or None if the topic has none
+    """
+    recent_ids = db.select(recent_answers(user_id, topic_id, window).c.question_id)
+    for exclude_recent in (True, False):
+        for level in difficulties_nearest(difficulty):
+            stmt = (
+                db.select(Question)
+                .where(Question.topic_id == topic_id, Question.difficulty == level)
+                .order_by(Question.id)
+                .limit(1)
+            )
+            if exclude_recent:
+                stmt = stmt.where(Question.id.not_in(recent_ids))
+            question = db.session.scalars(stmt).first()
+            if question is not None:
+                return question
+    return None
+
+
+def difficulties_nearest(difficulty, levels=range(1, 6)):
+    """Difficulty levels sorted by distance from ``difficulty``, harder first on ties."""
+    return sorted(levels, key=lambda level: (abs(level - difficulty), -level))
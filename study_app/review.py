@@ -0,0 +1,156 @@
+"""Spaced-repetition scheduling (SM-2) of answered questions.
+
+Every answer updates the user's ``ReviewState`` for that question with one
+upsert, however many answers are recorded together. The current states are
+read with the answered questions (``with_review_state``) or with one extra
+SELECT. ``due_reviews`` reads the earliest due items through the
+(user_id, due_at) index, so building a review set never touches the
+``UserResponse`` history.
+"""
+from datetime import datetime, timedelta
+
+from study_app import db
+from study_app.models import Question, ReviewState
+from study_app.persistence import upsert
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+
+def answer_quality(is_correct, response_time):
+    """
+    Grade an answer on the SM-2 0-5 scale.
+
+    Multiple-choice answers carry no self-assessment, so quality comes from
+    correctness and speed: fast correct answers are 5, slow ones 3, and
+    wrong answers 1.
+    """
+    if not is_correct:
+        return 1
+    if response_time is not None and response_time <= 10:
+        return 5
+    if response_time is None or response_time <= 30:
+        return 4
+    return 3
+
+
+def sm2(repetitions, interval_days, ease, quality):
+    """
+    Apply one SM-2 review.
+
+    Args:
+        repetitions (int): Successful reviews in a row so far
+        interval_days (int): Current interval
+        ease (float): Current ease factor
+        quality (int): Grade of this review (0-5)
+
+    Returns:
+        tuple: ``(repetitions, interval_days, ease)`` after the review
+    """
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < 3:
+        return 0, 1, ease
+    if repetitions == 0:
+        interval_days = 1
+    elif repetitions == 1:
+        interval_days = 6
+    else:
+        interval_days = round(interval_days * ease)
+    return repetitions + 1, interval_days, ease
+
+
+def with_review_state(stmt, user_id):
+    """
+    Add the user's review state columns to a SELECT over Question.
+
+    Lets callers that already look up the answered questions read the
+    current schedule in the same query; pass the rows through
+    ``review_state_of`` to ``record_reviews``.
+    """
+    return (
+        stmt.add_columns(ReviewState.repetitions, ReviewState.interval_days, ReviewState.ease)
+        .outerjoin(ReviewState, db.and_(ReviewState.question_id == Question.id,
+                                        ReviewState.user_id == user_id))
+    )
+
+
+def review_state_of(row):
+    """``(repetitions, interval_days, ease)`` of a ``with_review_state`` row, or None."""
+    if row.repetitions is None:
+        return None
+    return row.repetitions, row.interval_days, row.ease
+
+
+def record_reviews(user_id, answers, states=None, reviewed_at=None):
+    """
+    Reschedule the answered questions for a user.
+
+    Args:
+        user_id (int): The ID of the user.
+        answers (list): ``(question_id, is_correct, response_time)`` tuples,
+            in the order they were answered.
+        states (dict, optional): Current ``(repetitions, interval_days, ease)``
+            by question id, if the caller already loaded them; questions
+            missing from it start a new schedule. Loaded with one SELECT
+            when omitted.
+        reviewed_at (datetime, optional): Defaults to now (UTC).
+
+    Nothing is committed.
+    """
+    if not answers:
+        return
+    reviewed_at = reviewed_at or datetime.utcnow()
+    if states is None:
+        states = {
+            row.question_id: (row.repetitions, row.interval_days, row.ease)
+            for row in db.session.execute(
+                db.select(ReviewState.question_id, ReviewState.repetitions,
+                          ReviewState.interval_days, ReviewState.ease)
+                .where(ReviewState.user_id == user_id,
+                       ReviewState.question_id.in_({question_id for question_id, _, _ in answers}))
+            )
+        }
+    answered = {}
+    for question_id, is_correct, response_time in answers:
+        state = answered.get(question_id) or states.get(question_id) or (0, 0, INITIAL_EASE)
+        answered[question_id] = sm2(*state, answer_quality(is_correct, response_time))
+
+    rows = [
+        {'user_id': user_id, 'question_id': question_id, 'repetitions': repetitions,
+         'interval_days': interval_days, 'ease': ease,
+         'due_at': reviewed_at + timedelta(days=interval_days), 'last_reviewed_at': reviewed_at}
+        for question_id, (repetitions, interval_days, ease) in answered.items()
+    ]
+    db.session.execute(upsert(
+        ReviewState, rows, ['user_id', 'question_id'],
+        lambda excluded: {
+            'repetitions': excluded.repetitions,
+            'interval_days': excluded.interval_days,
+            'ease': excluded.ease,
+            'due_at': excluded.due_at,
+            'last_reviewed_at': excluded.last_reviewed_at,
+        }
+    ))
+
+
+def due_reviews(user_id, limit=20, now=None):
+    """
+    Return the user's earliest due questions.
+
+    Args:
+        user_id (int): The ID of the user.
+        limit (int): Maximum number of questions.
+        now (datetime, optional): Defaults to now (UTC).
+
+    Returns:
+        list: Question objects, most overdue first
+    """
+    now = now or datetime.utcnow()
+    return list(db.session.scalars(
+        db.select(Question)
+        .join(ReviewState, ReviewState.question_id == Question.id)
+        .where(ReviewState.user_id == user_id, ReviewState.due_at <= now)
+        .order_by(ReviewState.due_at)
+        .limit(limit)
+    ))
+
@@ -1,11 +1,20 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app, jsonify, session
+from flask import (Blueprint, render_template, redirect, url_for, request, flash, current_app, jsonify, session, abort,
+                   Response, stream_with_context)
 from study_app import db
-from study_app.models import User, Topic, Document, Question, Battle, UserResponse, Quest
-from study_app.pdf_processor import process_pdf_file
+from study_app.models import User, Topic, Document, Question, Battle, UserResponse, Quest, IngestionJob, UserTopicStats, DocumentContent, DocumentChunk
+from study_app.models import QuestionSignature, QuestionBucket, ReviewState
 # Removed evaluate_answer import
-from study_app.ai_interface import generate_questions
-from study_app.game_logic import calculate_xp, update_user_stats, award_xp
-import os
+from study_app.jobs import enqueue_job, iter_job_events
+from study_app.storage import save_upload
+from study_app.persistence import bulk_insert, default_quest_rows
+from study_app.identity import get_current_user, get_current_user_id, get_identity
+from study_app.queries import topic_summaries, topic_documents, topic_questions, next_training_question
+from study_app.stats import record_answers, get_user_stats, current_streak
+from study_app.review import record_reviews, due_reviews, with_review_state, review_state_of
+from study_app.game_logic import (add_xp, advance_quests, recent_performance,
+                                  get_next_question_difficulty, calculate_boss_difficulty)
+from study_app.sampling import sample_battle_questions
+from study_app.search import search_questions, search_documents, count_results
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import json # Import json for models
@@ -13,44 +22,88 @@ import json # Import json for models
 # Create a Blueprint for our main routes
 main_bp = Blueprint('main', __name__)
 
-# Assume a function to get the current user (replace with actual auth later)
-def get_current_user():
-    """Gets user with ID 1, creating a default one if it doesn't exist (for testing)."""
-    user = db.session.get(User, 1)
-    if not user:
-        # Create a default user if user 1 doesn't exist
-        print("Creating default user with ID 1 for testing.")
-        user = User(id=1, username='TestUser', email='test@example.com', level=1, total_xp=0)
-        db.session.add(user)
-        try:
-            db.session.commit()
-            print("Default user created successfully.")
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error creating default user: {e}")
-            return None # Return None if creation failed
-        # Re-fetch the user after commit to ensure it's attached to the session
-        user = db.session.get(User, 1)
-    return user
+def sse_message(event, data=None, event_id=None):
+    """Format one Server-Sent Events message; without an event name it is a comment."""
+    if event is None:
+        return ": keep-alive\n\n"
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+def requested_question_count(default=5):
+    """The form's ``question_count``, clamped to 1..``MAX_QUESTIONS_PER_JOB``."""
+    count = request.form.get('question_count', default, type=int)
+    return max(1, min(count, current_app.config['MAX_QUESTIONS_PER_JOB']))
+
+def profile_stats(stats):
+    """Template variables for the stats cards on the dashboard and profile."""
+    if stats is None:
+        return {}
+    return {
+        'user_responses': stats.total_responses,
+        'correct_answers': stats.correct_responses,
+        'knowledge_rate': stats.knowledge_rate,
+        'streak': current_streak(stats),
+    }
 
 @main_bp.route('/')
 def index():
     """Landing page or dashboard if user is logged in."""
     user = get_current_user()
-    topics = Topic.query.filter_by(user_id=user.id).all() if user else []
+    topics = topic_summaries(user_id=user.id) if user else []
+    stats = get_user_stats(user.id) if user else None
     # Pass user object directly
-    return render_template('index.html', user=user, topics=topics)
+    return render_template('index.html', user=user, topics=topics, **profile_stats(stats))
 
 @main_bp.route('/topic/<int:topic_id>')
 def view_topic(topic_id):
     """View a topic's details, documents, and questions."""
     user = get_current_user()
-    topic = Topic.query.get_or_404(topic_id)
+    topics = topic_summaries(topic_id=topic_id)
+    if not topics:
+        abort(404)
+    topic = topics[0]
     # Ensure the topic belongs to the user or handle permissions appropriately
     # if user and topic.user_id != user.id:
     #     flash("You don't have permission to view this topic.", "danger")
     #     return redirect(url_for('main.index'))
-    return render_template('topic.html', topic=topic, user=user)
+    return render_template('topic.html', topic=topic, user=user,
+                           documents=topic_documents(topic_id), questions=topic_questions(topic_id))
+
+@main_bp.route('/document/<int:document_id>/content')
+def document_content(document_id):
+    """Return a document's full extracted text, decompressed on demand."""
+    document = db.session.get(Document, document_id)
+    if not document:
+        return jsonify({'error': 'Document not found'}), 404
+    return jsonify({'id': document.id, 'filename': document.filename, 'content': document.content})
+
+@main_bp.route('/document/<int:document_id>/regenerate', methods=['POST'])
+def regenerate_questions(document_id):
+    """Queue more questions for a document, generated from its least covered stored chunks."""
+    document = Document.query.get_or_404(document_id)
+
+    job = IngestionJob(
+        kind='regenerate',
+        user_id=get_current_user_id(),
+        topic_id=document.topic_id,
+        document_id=document.id,
+        filename=document.filename,
+        file_path=document.file_path,
+        num_questions=requested_question_count()
+    )
+    db.session.add(job)
+    db.session.commit()
+    enqueue_job(current_app._get_current_object(), job.id)
+
+    status_url = url_for('main.job_status', job_id=job.id)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job_id': job.id, 'status_url': status_url,
+                        'events_url': url_for('main.job_events', job_id=job.id)}), 202
+
+    flash(f"Generating more questions from {document.filename} in the background.")
+    return redirect(url_for('main.view_topic', topic_id=document.topic_id))
 
 @main_bp.route('/upload', methods=['GET', 'POST'])
 def upload_document():
@@ -69,103 +122,150 @@ def upload_document():
             return redirect(request.url)
         
         if file:
-            # Secure the filename and save the file
+            # Secure the filename and store the file under its content hash
             filename = secure_filename(file.filename)
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
+            file_path, content_hash = save_upload(file, current_app.config['UPLOAD_FOLDER'])
             
             # Get form data
             topic_id = request.form.get('topic_id')
+            user_id = get_current_user_id()
             if not topic_id:
                 # Create a new topic if none exists
                 topic_title = request.form.get('topic_title', 'Untitled Topic')
                 topic_description = request.form.get('topic_description', '')
                 
-                # For now using a mock user until auth is implemented
-                mock_user_id = 1
-                
                 new_topic = Topic(
                     title=topic_title,
                     description=topic_description,
-                    user_id=mock_user_id
+                    user_id=user_id
                 )
                 db.session.add(new_topic)
                 db.session.flush()  # Generate ID for new_topic without committing
                 topic_id = new_topic.id
+                # A new topic gets its default quests once; later uploads into it don't add more
+                bulk_insert(Quest, default_quest_rows(user_id, topic_title))
             
-            # Process the PDF file
-            extracted_text = process_pdf_file(file_path)
-            
-            # Save document to database
-            new_document = Document(
+            # Queue extraction and question generation
+            job = IngestionJob(
+                user_id=user_id,
+                topic_id=topic_id,
                 filename=filename,
                 file_path=file_path,
-                topic_id=topic_id,
-                content=extracted_text
+                content_hash=content_hash,
+                num_questions=requested_question_count()
             )
-            db.session.add(new_document)
-            db.session.commit()
-            
-            # Generate initial questions based on the document
-            # Request 4 options per question (1 correct, 3 distractors)
-            questions_data = generate_questions(extracted_text, num_questions=5, num_options=4)
-            
-            # Save questions to database
-            for q_data in questions_data:
-                # Ensure all required keys are present
-                if not all(k in q_data for k in ["question", "options", "answer", "explanation", "difficulty"]):
-                    flash(f"Skipping question due to missing data: {q_data.get('question', 'N/A')}", "warning")
-                    continue
-                    
-                new_question = Question(
-                    content=q_data['question'],
-                    # Use the options_list setter to store options as JSON
-                    options_list=q_data['options'], 
-                    answer=q_data['answer'],
-                    explanation=q_data['explanation'],
-                    difficulty=q_data['difficulty'],
-                    topic_id=topic_id
-                    # xp_value is handled by default in the model
-                )
-                db.session.add(new_question)
-
+            db.session.add(job)
             db.session.commit()
+            enqueue_job(current_app._get_current_object(), job.id)
 
-            # Create default quests for the new topic
-            training_quest = Quest(
-                user_id=mock_user_id,
-                title=f"Study {topic_title}",
-                description="Answer 5 training questions from this topic",
-                target=5,
-                quest_type='training',
-                reward_xp=50
-            )
-            battle_quest = Quest(
-                user_id=mock_user_id,
-                title=f"Defeat the {topic_title} Boss",
-                description="Answer 5 battle questions correctly",
-                target=5,
-                quest_type='battle',
-                reward_xp=75
-            )
-            db.session.add_all([training_quest, battle_quest])
-            db.session.commit()
+            status_url = url_for('main.job_status', job_id=job.id)
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({'job_id': job.id, 'status_url': status_url,
+                                'events_url': url_for('main.job_events', job_id=job.id)}), 202
 
-            flash('Document uploaded and processed successfully!')
+            flash('Document uploaded! Questions are being generated in the background.')
             return redirect(url_for('main.view_topic', topic_id=topic_id))
     
     # For GET requests, show the upload form
     topics = Topic.query.all()
     return render_template('upload.html', topics=topics)
 
+@main_bp.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    """Poll the status of a background ingestion job."""
+    job = db.session.get(IngestionJob, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    data = job.to_dict()
+    data['topic_url'] = url_for('main.view_topic', topic_id=job.topic_id)
+    return jsonify(data)
+
+@main_bp.route('/jobs/<int:job_id>/events')
+def job_events(job_id):
+    """Stream a job's progress and each question as it is saved (Server-Sent Events)."""
+    job = db.session.get(IngestionJob, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    topic_url = url_for('main.view_topic', topic_id=job.topic_id)
+    last_question_id = request.headers.get('Last-Event-ID', 0, type=int)
+
+    def stream():
+        for event, data, event_id in iter_job_events(job_id, last_question_id):
+            if event == 'keep-alive':
+                yield sse_message(None)
+                continue
+            if event != 'question':
+                data['topic_url'] = topic_url
+            yield sse_message(event, data, event_id)
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @main_bp.route('/training/<int:topic_id>')
 def training_mode(topic_id):
-    """Training mode for a specific topic."""
+    """Training mode for a specific topic. The page fetches each question from ``/training/<id>/next``."""
     user = get_current_user() # Fetch the user
     topic = Topic.query.get_or_404(topic_id)
-    questions = Question.query.filter_by(topic_id=topic_id).order_by(Question.difficulty).all()
+    question_count = db.session.scalar(
+        db.select(db.func.count(Question.id)).where(Question.topic_id == topic_id))
+    session_size = min(question_count, current_app.config['TRAINING_SESSION_SIZE'])
     # Pass user to the template
-    return render_template('training.html', topic=topic, questions=questions, user=user)
+    return render_template('training.html', topic=topic, session_size=session_size, user=user)
+
+@main_bp.route('/training/<int:topic_id>/next')
+def next_training_question_api(topic_id):
+    """Pick the next training question adapted to the user's recent answers."""
+    user = get_identity()
+    if not user:
+        return jsonify({'error': 'User not logged in'}), 401
+
+    window = current_app.config['ADAPTIVE_WINDOW']
+    performance = recent_performance(user.id, topic_id, db.session, window=window)
+    difficulty = get_next_question_difficulty(performance)
+    question = next_training_question(user.id, topic_id, difficulty, window=window)
+    if question is None:
+        return jsonify({'error': 'No questions for this topic'}), 404
+
+    return jsonify({
+        'target_difficulty': difficulty,
+        'performance': performance._asdict(),
+        'question': {
+            'id': question.id,
+            'content': question.content,
+            'options': question.options_list,
+            'difficulty': question.difficulty,
+            'xp_value': question.xp_value,
+        },
+    })
+
+@main_bp.route('/review')
+def review_mode():
+    """Review the questions that are due under the user's spaced-repetition schedule."""
+    user = get_current_user()
+    if not user:
+        flash("Please log in to review.", "warning")
+        return redirect(url_for('main.index'))
+    questions = due_reviews(user.id, limit=current_app.config['REVIEW_SESSION_SIZE'])
+    return render_template('review.html', questions=questions, user=user)
+
+@main_bp.route('/search')
+def search():
+    """Full-text search over the user's questions and documents."""
+    user = get_current_user()
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('type', 'questions')
+    if kind not in ('questions', 'documents'):
+        kind = 'questions'
+    page = max(1, request.args.get('page', 1, type=int))
+
+    results = None
+    counts = {}
+    if query and user:
+        search_kind = search_documents if kind == 'documents' else search_questions
+        results = search_kind(user.id, query, page=page, per_page=current_app.config['SEARCH_PAGE_SIZE'])
+        other = 'questions' if kind == 'documents' else 'documents'
+        counts = {kind: results.total, other: count_results(other, user.id, query)}
+    return render_template('search.html', user=user, query=query, kind=kind, results=results, counts=counts)
 
 @main_bp.route('/battle/<int:topic_id>')
 def battle_mode(topic_id):
@@ -177,29 +277,45 @@ def battle_mode(topic_id):
         
     topic = Topic.query.get_or_404(topic_id)
     
+    # Scale the boss to the user's level and accuracy on this topic
+    topic_stats = db.session.get(UserTopicStats, (user.id, topic_id))
+    topic_performance = None
+    if topic_stats and topic_stats.total_responses:
+        topic_performance = topic_stats.correct_responses / topic_stats.total_responses
+    boss_difficulty = calculate_boss_difficulty(user.level, topic_performance)
+
     # Create a new battle instance
     # Use the actual user's ID
     new_battle = Battle(
         user_id=user.id, 
         topic_id=topic_id,
-        difficulty=1 # Consider using calculate_boss_difficulty(user.level)
+        difficulty=boss_difficulty
     )
     db.session.add(new_battle)
+
+    # Draw a random set of questions around the boss difficulty
+    questions = sample_battle_questions(
+        user.id, topic_id, boss_difficulty,
+        count=current_app.config['BATTLE_QUESTION_COUNT'],
+        recent_window=current_app.config['BATTLE_RECENT_WINDOW']
+    )
     db.session.commit()
     
     # Store the battle ID in session
     session['battle_id'] = new_battle.id
     
-    # Get challenging questions for the battle
-    questions = Question.query.filter_by(topic_id=topic_id).order_by(Question.difficulty.desc()).limit(5).all()
-    
     # Pass user to the template
     return render_template('battle.html', topic=topic, questions=questions, battle=new_battle, user=user)
 
 @main_bp.route('/answer', methods=['POST'])
 def submit_answer():
-    """Submit an answer to a question."""
-    user = get_current_user()
+    """Submit an answer to a question.
+    
+    Runs in a single transaction with a fixed number of statements: one
+    question lookup, the response INSERT, stats upserts, and atomic UPDATEs
+    for battle score, quest progress and user XP.
+    """
+    user = get_identity()
     if not user:
         return jsonify({'error': 'User not logged in'}), 401
         
@@ -208,66 +324,63 @@ def submit_answer():
     user_answer = data.get('answer') # This will now be the selected option text
     response_time = data.get('response_time')
     
-    question = db.session.get(Question, question_id)
+    question = db.session.execute(with_review_state(
+        db.select(Question.answer, Question.explanation, Question.xp_value, Question.topic_id)
+        .where(Question.id == question_id),
+        user.id
+    )).first()
     if not question:
         return jsonify({'error': 'Question not found'}), 404
+    question_id = int(question_id)
 
     # Direct comparison for multiple-choice
     is_correct = (user_answer == question.answer)
     explanation = question.explanation # Use the stored explanation
-    
-    xp_to_add = 0
-    if is_correct:
-        xp_to_add = question.xp_value
+    xp_to_add = question.xp_value if is_correct else 0
 
     # Store user's response
-    user_response = UserResponse(
-        user_id=user.id, # Use logged-in user's ID
+    db.session.execute(db.insert(UserResponse).values(
+        user_id=user.id,
         question_id=question_id,
+        topic_id=question.topic_id,
         response_text=user_answer, # Store the selected option text
         is_correct=is_correct,
         response_time=response_time
-    )
-    db.session.add(user_response)
-    
-    leveled_up = False
-    if is_correct and xp_to_add > 0:
-        # Award XP and update level using the helper function
-        leveled_up = award_xp(user.id, xp_to_add, db.session) # Use logged-in user's ID
-        # REMOVED: flash(f"Correct! +{xp_to_add} XP", 'success')
-        if leveled_up:
-            # User object in session is already updated by award_xp
-            # REMOVED: flash(f"Level Up! You reached Level {user.level}!", 'info')
-            pass # Keep structure, but no flash needed here
-    elif not is_correct:
-        # Provide the correct answer in the feedback for incorrect answers
-        # REMOVED: flash(f"Incorrect. The correct answer was: '{question.answer}'. Explanation: {explanation}", 'danger')
-        pass # Keep structure, but no flash needed here
-    else: # Correct but 0 XP
-        # REMOVED: flash("Correct!", 'success')
-        pass # Keep structure, but no flash needed here
-
-    # Update battle progress if in battle mode
+    ))
+    record_answers(user.id, question.topic_id, 1, int(is_correct), response_time or 0.0)
+    record_reviews(user.id, [(question_id, is_correct, response_time)],
+                   states={question_id: review_state_of(question)})
+
+    # Update battle progress if in battle mode (ensuring it belongs to the user)
     battle_id = session.get('battle_id')
     battle_updated_status = None
-    
     if battle_id:
-        battle = db.session.get(Battle, battle_id)
-        # Ensure battle belongs to the current user
-        if battle and battle.user_id == user.id:
-            battle.score += xp_to_add 
-            # Potentially add logic here to end battle if won/lost
-            # e.g., if battle.score >= required_score: battle.status = 'won'
-            battle_updated_status = battle.status
+        battle_updated_status = db.session.execute(
+            db.update(Battle)
+            .where(Battle.id == battle_id, Battle.user_id == user.id)
+            .values(score=Battle.score + xp_to_add)
+            .returning(Battle.status)
+            .execution_options(synchronize_session=False)
+        ).scalar()
     
-    # Update quest progress for correct answers
-    from study_app.game_logic import update_quest_progress
+    # Update quest progress for correct answers; rewards are added with the answer XP
     quests_completed = []
+    quest_reward_xp = 0
     if is_correct:
         q_type = 'battle' if battle_id else 'training'
-        quests_completed = update_quest_progress(user.id, db.session, quest_type=q_type, increment=1)
+        completed = advance_quests(user.id, db.session, quest_type=q_type, increment=1)
+        quests_completed = [title for title, _ in completed]
+        quest_reward_xp = sum(reward for _, reward in completed)
+
+    # Award XP and update level in one atomic UPDATE
+    if xp_to_add + quest_reward_xp > 0:
+        user_level, user_total_xp, leveled_up = add_xp(user.id, xp_to_add + quest_reward_xp, db.session)
+    else:
+        user_level, user_total_xp = db.session.execute(
+            db.select(User.level, User.total_xp).where(User.id == user.id)
+        ).one()
+        leveled_up = False
 
-    # Commit session changes
     db.session.commit()
     
     return jsonify({
@@ -279,8 +392,125 @@ def submit_answer():
         'battle_status': battle_updated_status,
         'leveled_up': leveled_up,
         # Send back updated user stats for potential UI updates
-        'user_level': user.level,
-        'user_total_xp': user.total_xp,
+        'user_level': user_level,
+        'user_total_xp': user_total_xp,
+        'quests_completed': quests_completed
+    })
+
+@main_bp.route('/answers/batch', methods=['POST'])
+def submit_answer_batch():
+    """Submit a round of answers at once.
+
+    Expects ``{"answers": [{"question_id", "answer", "response_time"}, ...]}``.
+    All questions are looked up with one IN query, and the responses, stats,
+    battle score, quest progress and XP are written in a single transaction.
+    Answers to unknown questions get an ``error`` result and are skipped.
+    """
+    user = get_identity()
+    if not user:
+        return jsonify({'error': 'User not logged in'}), 401
+
+    answers = (request.get_json(silent=True) or {}).get('answers')
+    if not isinstance(answers, list) or not answers:
+        return jsonify({'error': 'answers must be a non-empty list'}), 400
+    if len(answers) > current_app.config['ANSWER_BATCH_MAX_SIZE']:
+        return jsonify({'error': f"At most {current_app.config['ANSWER_BATCH_MAX_SIZE']} answers per batch"}), 400
+    try:
+        answers = [
+            (int(a['question_id']), a.get('answer'),
+             float(a['response_time']) if a.get('response_time') is not None else None)
+            for a in answers
+        ]
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'Every answer needs a numeric question_id and response_time'}), 400
+    question_ids = {question_id for question_id, _, _ in answers}
+
+    questions = {
+        row.id: row for row in db.session.execute(with_review_state(
+            db.select(Question.id, Question.answer, Question.explanation, Question.xp_value, Question.topic_id)
+            .where(Question.id.in_(question_ids)),
+            user.id
+        ))
+    }
+
+    results = []
+    response_rows = []
+    topic_totals = {}  # topic_id -> [total, correct, response_time]
+    xp_to_add = 0
+    correct_count = 0
+    for question_id, user_answer, response_time in answers:
+        question = questions.get(question_id)
+        if question is None:
+            results.append({'question_id': question_id, 'error': 'Question not found'})
+            continue
+        is_correct = (user_answer == question.answer)
+        xp_earned = question.xp_value if is_correct else 0
+        xp_to_add += xp_earned
+        correct_count += int(is_correct)
+        response_rows.append({
+            'user_id': user.id,
+            'question_id': question_id,
+            'topic_id': question.topic_id,
+            'response_text': user_answer,
+            'is_correct': is_correct,
+            'response_time': response_time,
+        })
+        totals = topic_totals.setdefault(question.topic_id, [0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += int(is_correct)
+        totals[2] += response_time or 0.0
+        results.append({
+            'question_id': question_id,
+            'is_correct': is_correct,
+            'correct_answer': question.answer,
+            'explanation': question.explanation,
+            'xp_earned': xp_earned,
+        })
+
+    if response_rows:
+        db.session.execute(db.insert(UserResponse), response_rows)
+    for topic_id, (total, correct, response_time) in topic_totals.items():
+        record_answers(user.id, topic_id, total, correct, response_time)
+    record_reviews(user.id, [(row['question_id'], row['is_correct'], row['response_time'])
+                             for row in response_rows],
+                   states={question_id: review_state_of(row) for question_id, row in questions.items()})
+
+    battle_id = session.get('battle_id')
+    battle_updated_status = None
+    if battle_id and response_rows:
+        battle_updated_status = db.session.execute(
+            db.update(Battle)
+            .where(Battle.id == battle_id, Battle.user_id == user.id)
+            .values(score=Battle.score + xp_to_add)
+            .returning(Battle.status)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+
+    quests_completed = []
+    quest_reward_xp = 0
+    if correct_count:
+        q_type = 'battle' if battle_id else 'training'
+        completed = advance_quests(user.id, db.session, quest_type=q_type, increment=correct_count)
+        quests_completed = [title for title, _ in completed]
+        quest_reward_xp = sum(reward for _, reward in completed)
+
+    if xp_to_add + quest_reward_xp > 0:
+        user_level, user_total_xp, leveled_up = add_xp(user.id, xp_to_add + quest_reward_xp, db.session)
+    else:
+        user_level, user_total_xp = db.session.execute(
+            db.select(User.level, User.total_xp).where(User.id == user.id)
+        ).one()
+        leveled_up = False
+
+    db.session.commit()
+
+    return jsonify({
+        'results': results,
+        'xp_earned': xp_to_add,
+        'battle_status': battle_updated_status,
+        'leveled_up': leveled_up,
+        'user_level': user_level,
+        'user_total_xp': user_total_xp,
         'quests_completed': quests_completed
     })
 
@@ -293,16 +523,18 @@ def user_profile():
         flash("Please log in to view your profile.", "warning")
         return redirect(url_for('main.index')) # Or a login page
     
-    topics = Topic.query.filter_by(user_id=user.id).all()
+    topics = topic_summaries(user_id=user.id)
     battles = Battle.query.filter_by(user_id=user.id).order_by(Battle.started_at.desc()).all()
     
+    stats = get_user_stats(user.id)
+    
     # Pass user object directly
-    return render_template('profile.html', user=user, topics=topics, battles=battles)
+    return render_template('profile.html', user=user, topics=topics, battles=battles, **profile_stats(stats))
 
 @main_bp.route('/topic/<int:topic_id>/delete', methods=['POST'])
 def delete_topic(topic_id):
     """Delete a topic and its associated content."""
-    user = get_current_user()
+    user = get_identity()
     if not user:
         flash("Please log in to delete topics.", "warning")
         return redirect(url_for('main.index')) # Or login page
@@ -319,7 +551,12 @@ def delete_topic(topic_id):
         return redirect(url_for('main.index'))
 
     try:
-        # Delete associated questions first
+        # Delete rows referring to the topic's questions first
+        question_ids = db.select(Question.id).where(Question.topic_id == topic.id)
+        ReviewState.query.filter(ReviewState.question_id.in_(question_ids)).delete(synchronize_session=False)
+        UserResponse.query.filter(UserResponse.question_id.in_(question_ids)).delete(synchronize_session=False)
+        QuestionBucket.query.filter_by(topic_id=topic.id).delete()
+        QuestionSignature.query.filter_by(topic_id=topic.id).delete()
         Question.query.filter_by(topic_id=topic.id).delete()
         # Delete associated documents (consider deleting files from disk too)
         # Add logic here to delete files from the UPLOAD_FOLDER if needed
@@ -328,9 +565,35 @@ def delete_topic(topic_id):
         #         os.remove(doc.file_path)
         #     except OSError as e:
         #         print(f"Error deleting file {doc.file_path}: {e}")
+        # Text shared with identical uploads in other topics is handed over to one of them
+        source = db.aliased(Document)
+        heirs = db.session.execute(
+            db.select(Document.text_document_id, db.func.min(Document.id))
+            .join(source, source.id == Document.text_document_id)
+            .where(source.topic_id == topic.id, Document.topic_id != topic.id)
+            .group_by(Document.text_document_id)
+        ).all()
+        for source_id, heir_id in heirs:
+            DocumentContent.query.filter_by(document_id=source_id).update(
+                {'document_id': heir_id}, synchronize_session=False)
+            DocumentChunk.query.filter_by(document_id=source_id).update(
+                {'document_id': heir_id}, synchronize_session=False)
+            Document.query.filter_by(text_document_id=source_id).update(
+                {'text_document_id': heir_id}, synchronize_session=False)
+            Document.query.filter_by(id=heir_id).update({'text_document_id': None}, synchronize_session=False)
+        # Jobs refer to the documents
+        IngestionJob.query.filter_by(topic_id=topic.id).delete()
+        document_ids = db.select(Document.id).where(Document.topic_id == topic.id)
+        DocumentContent.query.filter(
+            DocumentContent.document_id.in_(document_ids)
+        ).delete(synchronize_session=False)
+        DocumentChunk.query.filter(
+            DocumentChunk.document_id.in_(document_ids)
+        ).delete(synchronize_session=False)
         Document.query.filter_by(topic_id=topic.id).delete()
-        # Delete associated battles
+        # Delete associated battles and per-topic stats
         Battle.query.filter_by(topic_id=topic.id).delete()
+        UserTopicStats.query.filter_by(topic_id=topic.id).delete()
         # Delete the topic itself
         db.session.delete(topic)
         db.session.commit()
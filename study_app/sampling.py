@@ -0,0 +1,114 @@
+"""Random, difficulty-targeted question sampling for battles.
+
+Every question carries a ``random_key`` drawn uniformly from [0, 1), and the
+(topic_id, difficulty, random_key) index keeps each difficulty bucket of a
+topic in random order. Drawing ``n`` questions from a bucket is a range scan
+of ``n`` index entries from a random pivot, wrapping around to the start of
+the bucket if needed, so the cost does not depend on the size of the
+question bank (unlike ``ORDER BY RANDOM()``, which sorts the whole topic).
+Drawn questions get fresh keys, so the next draw does not return the same
+neighbours.
+"""
+import random
+
+from study_app import db
+from study_app.game_logic import recent_answers
+from study_app.models import Question
+from study_app.queries import difficulties_nearest
+
+
+def difficulty_plan(target, count):
+    """
+    Split ``count`` questions over difficulty levels around ``target``.
+
+    One question comes from each neighbouring level (when it exists) and the
+    rest from ``target`` itself.
+
+    Returns:
+        dict: ``{difficulty: number_of_questions}``
+    """
+    plan = {target: count}
+    for level in (target - 1, target + 1):
+        if 1 <= level <= 5 and plan[target] > 1:
+            plan[level] = 1
+            plan[target] -= 1
+    return plan
+
+
+def draw_from_bucket(topic_id, difficulty, n, exclude=None, rng=random):
+    """
+    Draw up to ``n`` random questions of one difficulty from a topic.
+
+    Args:
+        topic_id (int): The topic
+        difficulty (int): The bucket to draw from
+        n (int): Number of questions wanted
+        exclude: Optional SELECT or list of question ids to leave out
+        rng: Source of the pivot
+
+    Returns:
+        list: Question objects, at most ``n``
+    """
+    if n <= 0:
+        return []
+    pivot = rng.random()
+    base = (
+        db.select(Question)
+        .where(Question.topic_id == topic_id, Question.difficulty == difficulty)
+        .order_by(Question.random_key)
+    )
+    if exclude is not None:
+        base = base.where(Question.id.not_in(exclude))
+    drawn = list(db.session.scalars(base.where(Question.random_key >= pivot).limit(n)))
+    if len(drawn) < n:
+        drawn += db.session.scalars(base.where(Question.random_key < pivot).limit(n - len(drawn)))
+    return drawn
+
+
+def sample_battle_questions(user_id, topic_id, target_difficulty, count=5, recent_window=20, rng=random):
+    """
+    Pick a random set of battle questions around ``target_difficulty``.
+
+    Questions among the user's last ``recent_window`` answers on the topic
+    are skipped. Buckets that run short are topped up from the nearest
+    difficulties, and the recent-answer exclusion is dropped only if the
+    topic has nothing else left.
+
+    Args:
+        user_id (int): The player
+        topic_id (int): The topic of the battle
+        target_difficulty (int): Boss difficulty (1-5)
+        count (int): Number of questions
+        recent_window (int): How many recent answers count as "recently seen"
+        rng: Source of randomness
+
+    Returns:
+        list: Question objects ordered from easiest to hardest
+    """
+    recent = db.select(recent_answers(user_id, topic_id, recent_window).c.question_id)
+    picked = []
+    for exclude in (recent, None):
+        if picked:
+            exclude = [q.id for q in picked]  # Second pass: only avoid duplicates
+        plan = difficulty_plan(target_difficulty, count - len(picked))
+        shortfall = 0
+        for level in difficulties_nearest(target_difficulty):
+            wanted = plan.get(level, 0) + shortfall
+            drawn = draw_from_bucket(topic_id, level, wanted, exclude=exclude, rng=rng)
+            picked += drawn
+            shortfall = wanted - len(drawn)
+        if len(picked) >= count:
+            break
+
+    reshuffle(picked, rng)
+    return sorted(picked, key=lambda q: q.difficulty or 0)
+
+
+def reshuffle(questions, rng=random):
+    """Give drawn questions new random keys with one executemany UPDATE."""
+    if not questions:
+        return
+    db.session.execute(
+        db.update(Question),
+        [{'id': q.id, 'random_key': rng.random()} for q in questions]
+    )
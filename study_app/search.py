@@ -0,0 +1,338 @@
+"""Full-text search over documents and questions.
+
+On SQLite the index is two FTS5 external-content tables: ``question_fts``
+over ``question.content`` and ``question.explanation``, and
+``document_chunk_fts`` over ``document_chunk.text``. They read their text
+from the indexed rows instead of storing a copy. Triggers keep them in sync,
+so every write path (ORM, bulk inserts, topic deletion, duplicate merging)
+updates the index. On PostgreSQL the same columns get GIN indexes on their
+``to_tsvector`` expressions.
+
+Documents are searched through their chunks, since the full text is stored
+compressed. A document ranks by its best matching chunk, and its snippet
+comes from its first matching chunk. Identical uploads share one set of
+chunks (``document.text_document_id``), so a match finds each of them.
+
+The index is created at startup next to ``db.create_all()``. Existing rows
+are indexed the first time the index is created. ``flask search rebuild``
+re-indexes everything, first splitting documents stored before chunks
+existed, which search could not find otherwise.
+"""
+from collections import namedtuple
+import re
+
+import click
+from markupsafe import Markup, escape
+
+from study_app import db
+from study_app.jobs import backfill_chunks
+
+# Snippet highlight markers, replaced by <mark> after the text is escaped
+_START, _STOP = '\x02', '\x03'
+_TOKEN = re.compile(r'\w+')
+MAX_TERMS = 16
+
+# Tables and indexes created here rather than from the models
+INDEX_NAMES = ('question_fts', 'document_chunk_fts', 'ix_question_search', 'ix_document_chunk_search')
+
+SearchPage = namedtuple('SearchPage', ['items', 'total', 'page', 'per_page'])
+
+# Per table: its CREATE statement and the triggers that keep it in sync
+_SQLITE_SCHEMA = {
+    'question_fts': (
+        """CREATE VIRTUAL TABLE question_fts USING fts5(
+            content, explanation, content='question', content_rowid='id', tokenize='porter unicode61')""",
+        {
+            'question_fts_insert': """CREATE TRIGGER question_fts_insert AFTER INSERT ON question BEGIN
+                INSERT INTO question_fts(rowid, content, explanation) VALUES (new.id, new.content, new.explanation);
+            END""",
+            'question_fts_delete': """CREATE TRIGGER question_fts_delete AFTER DELETE ON question BEGIN
+                INSERT INTO question_fts(question_fts, rowid, content, explanation)
+                VALUES ('delete', old.id, old.content, old.explanation);
+            END""",
+            # Only text changes touch the index (battles rewrite random_key constantly)
+            'question_fts_update': """CREATE TRIGGER question_fts_update
+                AFTER UPDATE OF content, explanation ON question BEGIN
+                INSERT INTO question_fts(question_fts, rowid, content, explanation)
+                VALUES ('delete', old.id, old.content, old.explanation);
+                INSERT INTO question_fts(rowid, content, explanation) VALUES (new.id, new.content, new.explanation);
+            END""",
+        },
+    ),
+    'document_chunk_fts': (
+        """CREATE VIRTUAL TABLE document_chunk_fts USING fts5(
+            text, content='document_chunk', content_rowid='id', tokenize='porter unicode61')""",
+        {
+            'document_chunk_fts_insert': """CREATE TRIGGER document_chunk_fts_insert
+                AFTER INSERT ON document_chunk BEGIN
+                INSERT INTO document_chunk_fts(rowid, text) VALUES (new.id, new.text);
+            END""",
+            'document_chunk_fts_delete': """CREATE TRIGGER document_chunk_fts_delete
+                AFTER DELETE ON document_chunk BEGIN
+                INSERT INTO document_chunk_fts(document_chunk_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END""",
+            'document_chunk_fts_update': """CREATE TRIGGER document_chunk_fts_update
+                AFTER UPDATE OF text ON document_chunk BEGIN
+                INSERT INTO document_chunk_fts(document_chunk_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                INSERT INTO document_chunk_fts(rowid, text) VALUES (new.id, new.text);
+            END""",
+        },
+    ),
+}
+
+_POSTGRES_SCHEMA = [
+    """CREATE INDEX IF NOT EXISTS ix_question_search ON question
+        USING gin (to_tsvector('english', content || ' ' || coalesce(explanation, '')))""",
+    """CREATE INDEX IF NOT EXISTS ix_document_chunk_search ON document_chunk
+        USING gin (to_tsvector('english', text))""",
+]
+
+# Each query takes :query, :user_id and, for pages, :limit and :offset.
+# bm25 ranks lower-is-better; ts_rank higher-is-better.
+_SQL = {
+    'sqlite': {
+        'questions': """
+            SELECT q.id, q.content, q.topic_id, t.title AS topic_title,
+                   snippet(question_fts, -1, :start, :stop, '…', 24) AS snippet
+            FROM question_fts
+            JOIN question q ON q.id = question_fts.rowid
+            JOIN topic t ON t.id = q.topic_id
+            WHERE question_fts MATCH :query AND t.user_id = :user_id
+            ORDER BY rank
+            LIMIT :limit OFFSET :offset""",
+        'questions_count': """
+            SELECT count(*)
+            FROM question_fts
+            JOIN question q ON q.id = question_fts.rowid
+            JOIN topic t ON t.id = q.topic_id
+            WHERE question_fts MATCH :query AND t.user_id = :user_id""",
+        'documents': """
+            SELECT d.id, d.filename, d.topic_id, t.title AS topic_title, best.document_id AS text_document_id
+            FROM (SELECT c.document_id, min(m.score) AS score
+                  FROM (SELECT rowid AS chunk_id, rank AS score
+                        FROM document_chunk_fts WHERE document_chunk_fts MATCH :query) AS m
+                  JOIN document_chunk c ON c.id = m.chunk_id
+                  GROUP BY c.document_id) AS best
+            JOIN document d ON d.id = best.document_id OR d.text_document_id = best.document_id
+            JOIN topic t ON t.id = d.topic_id
+            WHERE t.user_id = :user_id
+            ORDER BY best.score
+            LIMIT :limit OFFSET :offset""",
+        'documents_count': """
+            SELECT count(DISTINCT d.id)
+            FROM document_chunk_fts
+            JOIN document_chunk c ON c.id = document_chunk_fts.rowid
+            JOIN document d ON d.id = c.document_id OR d.text_document_id = c.document_id
+            JOIN topic t ON t.id = d.topic_id
+            WHERE document_chunk_fts MATCH :query AND t.user_id = :user_id""",
+        # First matching chunk of each document of the page. CROSS JOIN makes
+        # SQLite start from the page's chunks, and skipping bm25 avoids a scan
+        # of every match for corpus statistics.
+        'document_snippets': """
+            SELECT c.document_id, snippet(document_chunk_fts, 0, :start, :stop, '…', 32) AS snippet
+            FROM document_chunk c
+            CROSS JOIN document_chunk_fts ON document_chunk_fts.rowid = c.id
+            WHERE c.document_id IN :document_ids AND document_chunk_fts MATCH :query
+            ORDER BY c.document_id, c.position""",
+    },
+    'postgresql': {
+        'questions': """
+            SELECT q.id, q.content, q.topic_id, t.title AS topic_title,
+                   ts_headline('english', q.content || ' ' || coalesce(q.explanation, ''), query,
+                               :headline) AS snippet
+            FROM question q
+            JOIN topic t ON t.id = q.topic_id,
+                 to_tsquery('english', :query) AS query
+            WHERE to_tsvector('english', q.content || ' ' || coalesce(q.explanation, '')) @@ query
+              AND t.user_id = :user_id
+            ORDER BY ts_rank(to_tsvector('english', q.content || ' ' || coalesce(q.explanation, '')), query) DESC
+            LIMIT :limit OFFSET :offset""",
+        'questions_count': """
+            SELECT count(*)
+            FROM question q
+            JOIN topic t ON t.id = q.topic_id
+            WHERE to_tsvector('english', q.content || ' ' || coalesce(q.explanation, ''))
+                  @@ to_tsquery('english', :query)
+              AND t.user_id = :user_id""",
+        'documents': """
+            SELECT d.id, d.filename, d.topic_id, t.title AS topic_title, best.document_id AS text_document_id
+            FROM (SELECT c.document_id, max(ts_rank(to_tsvector('english', c.text), query)) AS score
+                  FROM document_chunk c, to_tsquery('english', :query) AS query
+                  WHERE to_tsvector('english', c.text) @@ query
+                  GROUP BY c.document_id) AS best
+            JOIN document d ON d.id = best.document_id OR d.text_document_id = best.document_id
+            JOIN topic t ON t.id = d.topic_id
+            WHERE t.user_id = :user_id
+            ORDER BY best.score DESC
+            LIMIT :limit OFFSET :offset""",
+        'documents_count': """
+            SELECT count(DISTINCT d.id)
+            FROM document_chunk c
+            JOIN document d ON d.id = c.document_id OR d.text_document_id = c.document_id
+            JOIN topic t ON t.id = d.topic_id
+            WHERE to_tsvector('english', c.text) @@ to_tsquery('english', :query)
+              AND t.user_id = :user_id""",
+        'document_snippets': """
+            SELECT DISTINCT ON (c.document_id) c.document_id,
+                   ts_headline('english', c.text, query, :headline) AS snippet
+            FROM document_chunk c, to_tsquery('english', :query) AS query
+            WHERE to_tsvector('english', c.text) @@ query AND c.document_id IN :document_ids
+            ORDER BY c.document_id, c.position""",
+    },
+}
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def include_name(name, type_, parent_names):
+    """Alembic filter that keeps the search index out of autogenerate."""
+    if type_ in ('table', 'index'):
+        return not name.startswith(INDEX_NAMES)
+    return True
+
+
+def ensure_search_index():
+    """Create the search index or its triggers if missing, indexing existing rows. Returns True if anything was created."""
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        for statement in _POSTGRES_SCHEMA:
+            db.session.execute(db.text(statement))
+        db.session.commit()
+        return False
+    if dialect != 'sqlite':
+        return False
+
+    existing = set(db.session.scalars(db.text(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE '%fts%'")))
+    created = False
+    for table, (create_table, triggers) in _SQLITE_SCHEMA.items():
+        # Rebuilding a table for a migration (batch_alter_table) drops its triggers
+        missing = [sql for name, sql in triggers.items() if name not in existing]
+        if table in existing and not missing:
+            continue
+        if table not in existing:
+            db.session.execute(db.text(create_table))
+        for statement in missing:
+            db.session.execute(db.text(statement))
+        # Index the rows written while the table or its triggers were missing
+        db.session.execute(db.text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+        created = True
+    db.session.commit()
+    return created
+
+
+def rebuild_search_index():
+    """Re-index every question and document chunk (SQLite; PostgreSQL indexes need no rebuild)."""
+    ensure_search_index()
+    if _dialect() == 'sqlite':
+        for table in _SQLITE_SCHEMA:
+            db.session.execute(db.text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+        db.session.commit()
+
+
+def match_query(text, dialect='sqlite'):
+    """
+    Turn user input into a full-text query.
+
+    Every word must match (after stemming). Operators and quotes in the
+    input are ignored rather than raising syntax errors. There is no prefix
+    matching: a short prefix expands to thousands of terms and makes the
+    query scan most of the index.
+
+    Returns:
+        str: The query, or None if ``text`` has no searchable words
+    """
+    terms = _TOKEN.findall((text or '').lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    if dialect == 'postgresql':
+        return ' & '.join(terms)
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def highlight(snippet):
+    """Escape a snippet and turn its match markers into <mark> tags."""
+    escaped = str(escape(snippet or ''))
+    return Markup(escaped.replace(_START, '<mark>').replace(_STOP, '</mark>'))
+
+
+def _params(query, user_id, **extra):
+    return {'query': query, 'user_id': user_id, 'start': _START, 'stop': _STOP,
+            'headline': f'StartSel={_START}, StopSel={_STOP}, MaxFragments=1, MaxWords=32, MinWords=12',
+            **extra}
+
+
+def _run(name, params, *bindparams):
+    # Unused parameters are ignored: SQLite snippets take :start/:stop, PostgreSQL :headline
+    return db.session.execute(db.text(_SQL[_dialect()][name]).bindparams(*bindparams), params)
+
+
+def count_results(kind, user_id, text):
+    """Return how many of the user's questions or documents (``kind``) match ``text``."""
+    query = match_query(text, _dialect())
+    if query is None:
+        return 0
+    return _run(f'{kind}_count', _params(query, user_id)).scalar()
+
+
+def search_questions(user_id, text, page=1, per_page=20):
+    """
+    Search the user's questions by content and explanation, best match first.
+
+    Returns:
+        SearchPage: ``items`` are dicts with id, content, topic_id, topic_title and snippet
+    """
+    query = match_query(text, _dialect())
+    if query is None:
+        return SearchPage([], 0, page, per_page)
+    params = _params(query, user_id, limit=per_page, offset=(page - 1) * per_page)
+    total = _run('questions_count', params).scalar()
+    items = [dict(row._mapping, snippet=highlight(row.snippet)) for row in _run('questions', params)]
+    return SearchPage(items, total, page, per_page)
+
+
+def search_documents(user_id, text, page=1, per_page=20):
+    """
+    Search the user's documents, ranked by their best matching chunk.
+
+    Returns:
+        SearchPage: ``items`` are dicts with id, filename, topic_id, topic_title and snippet
+    """
+    query = match_query(text, _dialect())
+    if query is None:
+        return SearchPage([], 0, page, per_page)
+    params = _params(query, user_id, limit=per_page, offset=(page - 1) * per_page)
+    total = _run('documents_count', params).scalar()
+    items = [dict(row._mapping) for row in _run('documents', params)]
+    if items:
+        snippets = {}
+        for document_id, snippet in _run('document_snippets',
+                                         dict(params, document_ids=[item['text_document_id'] for item in items]),
+                                         db.bindparam('document_ids', expanding=True)):
+            snippets.setdefault(document_id, snippet)
+        for item in items:
+            item['snippet'] = highlight(snippets.get(item.pop('text_document_id')))
+    return SearchPage(items, total, page, per_page)
+
+
+def init_app(app):
+    app.cli.add_command(search_cli)
+    with app.app_context():
+        ensure_search_index()
+
+
+@click.group('search')
+def search_cli():
+    """Manage the full-text search index."""
+
+
+@search_cli.command('rebuild')
+def rebuild_search_command():
+    """Split unchunked documents, then re-index all questions and document chunks."""
+    chunked = backfill_chunks()
+    if chunked:
+        click.echo(f"Split {chunked} documents into chunks.")
+    rebuild_search_index()
+    click.echo("Rebuilt the search index.")
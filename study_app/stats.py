@@ -0,0 +1,143 @@
+"""Incrementally maintained answer statistics.
+
+``record_answers`` updates the per-user and per-topic rows with one upsert
+each, so the profile page reads a single row regardless of history length.
+``flask stats rebuild`` recomputes every row from ``UserResponse``.
+"""
+from datetime import datetime, timedelta
+
+import click
+
+from study_app import db
+from study_app.models import UserResponse, Question, UserStats, UserTopicStats
+from study_app.persistence import upsert
+
+
+def record_answers(user_id, topic_id, total, correct, response_time, answered_at=None):
+    """
+    Add answers to the user's overall and per-topic stats.
+
+    Args:
+        user_id (int): The ID of the user.
+        topic_id (int): Topic of the answered questions.
+        total (int): Number of answers.
+        correct (int): How many of them were correct.
+        response_time (float): Sum of their response times in seconds.
+        answered_at (datetime, optional): Defaults to now (UTC).
+
+    Nothing is committed.
+    """
+    answered_at = answered_at or datetime.utcnow()
+    today = answered_at.date()
+    yesterday = today - timedelta(days=1)
+
+    streak = db.case(
+        (UserStats.last_active_date == today, UserStats.current_streak),
+        (UserStats.last_active_date == yesterday, UserStats.current_streak + 1),
+        else_=1
+    )
+    db.session.execute(upsert(
+        UserStats,
+        {'user_id': user_id, 'total_responses': total, 'correct_responses': correct,
+         'current_streak': 1, 'longest_streak': 1, 'last_active_date': today},
+        ['user_id'],
+        lambda excluded: {
+            'total_responses': UserStats.total_responses + excluded.total_responses,
+            'correct_responses': UserStats.correct_responses + excluded.correct_responses,
+            'current_streak': streak,
+            'longest_streak': db.case((UserStats.longest_streak > streak, UserStats.longest_streak),
+                                      else_=streak),
+            'last_active_date': excluded.last_active_date,
+        }
+    ))
+    db.session.execute(upsert(
+        UserTopicStats,
+        {'user_id': user_id, 'topic_id': topic_id, 'total_responses': total,
+         'correct_responses': correct, 'total_response_time': response_time or 0.0,
+         'last_answered_at': answered_at},
+        ['user_id', 'topic_id'],
+        lambda excluded: {
+            'total_responses': UserTopicStats.total_responses + excluded.total_responses,
+            'correct_responses': UserTopicStats.correct_responses + excluded.correct_responses,
+            'total_response_time': UserTopicStats.total_response_time + excluded.total_response_time,
+            'last_answered_at': excluded.last_answered_at,
+        }
+    ))
+
+
+def get_user_stats(user_id):
+    """Return the user's stats row, or an empty one if they have not answered yet."""
+    return db.session.get(UserStats, user_id) or UserStats(
+        user_id=user_id, total_responses=0, correct_responses=0, current_streak=0, longest_streak=0)
+
+
+def current_streak(stats, today=None):
+    """The streak shown to the user; it lapses after a day without answers."""
+    today = today or datetime.utcnow().date()
+    if stats.last_active_date is None or stats.last_active_date < today - timedelta(days=1):
+        return 0
+    return stats.current_streak
+
+
+def rebuild_stats():
+    """Recompute all stats rows from UserResponse with aggregate queries."""
+    db.session.execute(db.delete(UserTopicStats))
+    db.session.execute(db.delete(UserStats))
+
+    correct = db.func.sum(db.case((UserResponse.is_correct, 1), else_=0))
+    topic_rows = db.session.execute(
+        db.select(UserResponse.user_id, Question.topic_id, db.func.count(), correct,
+                  db.func.coalesce(db.func.sum(UserResponse.response_time), 0.0),
+                  db.func.max(UserResponse.created_at))
+        .join(Question, Question.id == UserResponse.question_id)
+        .group_by(UserResponse.user_id, Question.topic_id)
+    ).all()
+    if topic_rows:
+        db.session.execute(db.insert(UserTopicStats), [
+            {'user_id': user_id, 'topic_id': topic_id, 'total_responses': total,
+             'correct_responses': correct_count or 0, 'total_response_time': response_time,
+             'last_answered_at': last_answered_at}
+            for user_id, topic_id, total, correct_count, response_time, last_answered_at in topic_rows
+        ])
+
+    # Distinct active days per user, in order, to replay streaks
+    active_day = db.func.date(UserResponse.created_at)
+    day_rows = db.session.execute(
+        db.select(UserResponse.user_id, active_day).distinct()
+        .order_by(UserResponse.user_id, active_day)
+    ).all()
+    streaks = {}
+    for user_id, day in day_rows:
+        day = datetime.strptime(day, '%Y-%m-%d').date() if isinstance(day, str) else day
+        current, longest, last = streaks.get(user_id, (0, 0, None))
+        current = current + 1 if last == day - timedelta(days=1) else 1
+        streaks[user_id] = (current, max(longest, current), day)
+
+    totals = db.session.execute(
+        db.select(UserResponse.user_id, db.func.count(), correct).group_by(UserResponse.user_id)
+    ).all()
+    if totals:
+        db.session.execute(db.insert(UserStats), [
+            {'user_id': user_id, 'total_responses': total, 'correct_responses': correct_count or 0,
+             'current_streak': streaks[user_id][0], 'longest_streak': streaks[user_id][1],
+             'last_active_date': streaks[user_id][2]}
+            for user_id, total, correct_count in totals
+        ])
+    db.session.commit()
+    return len(totals), len(topic_rows)
+
+
+def init_app(app):
+    app.cli.add_command(stats_cli)
+
+
+@click.group('stats')
+def stats_cli():
+    """Manage the materialized answer statistics."""
+
+
+@stats_cli.command('rebuild')
+def rebuild_stats_command():
+    """Recompute user and topic stats from all responses."""
+    users, topics = rebuild_stats()
+    click.echo(f"Rebuilt stats for {users} users and {topics} user/topic pairs.")
@@ -0,0 +1,43 @@
+"""Content-addressed storage for uploaded files."""
+import hashlib
+import os
+import tempfile
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def save_upload(file_storage, upload_folder):
+    """
+    Stream an uploaded file to disk while hashing it.
+
+    Files are stored under their SHA-256 digest, so identical uploads share a
+    single copy on disk.
+
+    Args:
+        file_storage: The werkzeug ``FileStorage`` from ``request.files``
+        upload_folder (str): Directory to store uploads in
+
+    Returns:
+        tuple: ``(file_path, content_hash)``
+    """
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                block = file_storage.stream.read(UPLOAD_CHUNK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+                out.write(block)
+        content_hash = digest.hexdigest()
+        file_path = os.path.join(upload_folder, f"{content_hash}.pdf")
+        if os.path.exists(file_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, file_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return file_path, content_hash